@@ -243,7 +243,7 @@ class MovementAction(ActionWithDirection):
 
         if not self.engine.game_map.in_bounds(dest_x, dest_y):
             raise exceptions.Impossible("Destination is out of bounds.")
-        if not self.engine.game_map.tiles["walkable"][dest_x, dest_y]:
+        if not self.engine.game_map.walkable[dest_x, dest_y]:
             raise exceptions.Impossible("Destination is blocked by a tile.")
         if self.engine.game_map.get_blocking_entity_at_location(dest_x, dest_y):            
             # if self.entity.ai.is_auto:
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from typing import List, Optional, TYPE_CHECKING
+
+import numpy as np
+
+from various_enum import EffectType
+
+if TYPE_CHECKING:
+    from components.fightable import Fightable
+
+
+# Hot numbers of a fightable, one record per slot
+stat_dt = np.dtype(
+    [
+        ("in_use", bool),  # True if a fightable owns this slot.
+        ("hp", np.int64),  # hp x100, see Fightable._hp
+        ("max_hp", np.int32),
+        ("stun_point", np.int32),
+        ("regen_rate", np.int32),  # hp x100 regained each turn
+        ("effects", np.int32, (len(EffectType),)),  # remaining turns of each EffectType, 0 = inactive
+    ]
+)
+
+
+class ActorStats:
+    """Struct of arrays store for the numbers updated every turn (hp, stun, regen, effect durations).
+
+    Each GameMap owns one store for its actors, so that the regular clock is a handful of numpy operations.
+    A fightable outside of a map (prototypes, inventory, player between floors) owns a private store of one slot.
+    Fightable properties read and write through `data[field][slot]`."""
+
+    def __init__(self, capacity: int = 32):
+        self.data = np.zeros(capacity, dtype=stat_dt)
+        self.owners: List[Optional[Fightable]] = [None] * capacity
+
+    def allocate(self, owner: Fightable) -> int:
+        """Return a free slot for `owner`, growing the store if needed."""
+        free = np.flatnonzero(~self.data["in_use"])
+        if free.size:
+            slot = int(free[0])
+        else:
+            slot = len(self.owners)
+            self.data = np.concatenate((self.data, np.zeros(max(1, slot), dtype=stat_dt)))
+            self.owners += [None] * max(1, slot)
+        self.data["in_use"][slot] = True
+        self.owners[slot] = owner
+        return slot
+
+    def release(self, slot: int) -> None:
+        self.data[slot] = np.zeros((), dtype=stat_dt)
+        self.owners[slot] = None
+
+    def attach(self, fightable: Fightable) -> None:
+        """Move the numbers of `fightable` into this store."""
+        if fightable._stats is self:
+            return
+        slot = self.allocate(fightable)
+        self.data[slot] = fightable._stats.data[fightable._slot]
+        fightable._stats.release(fightable._slot)
+        fightable._stats, fightable._slot = self, slot
+
+    def detach(self, fightable: Fightable) -> None:
+        """Move the numbers of `fightable` back into a private store."""
+        if fightable._stats is not self:
+            return
+        private = ActorStats(capacity=1)
+        private.attach(fightable)
+
+    def tick(self, increment: int) -> np.ndarray:
+        """Apply `increment` turns of regen, stun recovery and effect countdown to the living actors.
+        The cost does not depend on `increment`.
+        Returns the slots that had active effects, so that their effects dict can be synchronized."""
+        data = self.data
+        live = data["in_use"] & (data["hp"] > 0)
+
+        data["stun_point"][live] = np.maximum(0, data["stun_point"][live] - increment)
+
+        max_hp = data["max_hp"].astype(np.int64) * 100
+        regen = live & (data["hp"] < max_hp)
+        data["hp"][regen] = np.minimum(max_hp[regen], data["hp"][regen] + data["regen_rate"][regen].astype(np.int64) * increment)
+
+        with_effects = live & (data["effects"] > 0).any(axis=1)
+        data["effects"][with_effects] = np.maximum(0, data["effects"][with_effects] - increment)
+
+        return np.flatnonzero(with_effects)
@@ -0,0 +1,85 @@
+"""Animations of the turn, played by the renderer.
+
+Combat only records what to show (projectile trails, hit tiles) and goes on : the frames queued between two player
+turns are merged and shown once, right before the player acts. Nothing is queued without a renderer or in instant
+travel, and the queue can be skipped.
+"""
+from __future__ import annotations
+
+import time
+from typing import Iterable, List, NamedTuple, Tuple, TYPE_CHECKING
+
+import numpy as np  # type: ignore
+
+import color
+import util.var_global as uv
+
+if TYPE_CHECKING:
+    from engine import Engine
+    from renderer import Renderer
+
+
+class Frame(NamedTuple):
+    """Map tiles to highlight
+       * `trail`: projectile path or blast area, drawn as `*`
+       * `hits`: tiles holding a target when the shot was resolved"""
+    trail: List[Tuple[int, int]]
+    hits: List[Tuple[int, int]]
+
+
+class AnimationQueue:
+    def __init__(self, engine: Engine, delay: float = 0.05):
+        self.engine = engine
+        self.delay = delay # time the merged frame is shown
+        self.frames: List[Frame] = []
+
+    def __getstate__(self) -> dict:
+        # frames are only worth showing in the running game
+        return {"engine": self.engine, "delay": self.delay}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self.frames = []
+
+    @property
+    def enabled(self) -> bool:
+        return self.engine.renderer is not None and not uv.instant_travel
+
+    def push(self, trail: Iterable[Tuple[int, int]], hits: Iterable[Tuple[int, int]] = ()) -> None:
+        if self.enabled:
+            self.frames.append(Frame([tuple(xy) for xy in trail], [tuple(xy) for xy in hits]))
+
+    def skip(self) -> None:
+        self.frames = []
+
+    def play(self, renderer: Renderer) -> bool:
+        """Draw the queued frames at once on the rendered console and show them for a moment.
+        Return True if something was shown : the console then needs to be rendered again."""
+        if not self.frames:
+            return False
+        trail = [xy for frame in self.frames for xy in frame.trail]
+        hits = [xy for frame in self.frames for xy in frame.hits]
+        self.frames = []
+
+        rgb = renderer.console.rgb
+        for tiles, draw in ((trail, self.draw_trail), (hits, self.draw_hits)):
+            if not tiles:
+                continue
+            xs, ys = renderer.shift(*np.array(tiles, dtype=np.intp).T)
+            # only the map view
+            in_view = (0 <= xs) & (xs < renderer.view_width) & (0 <= ys) & (ys < renderer.view_height)
+            draw(rgb, xs[in_view], ys[in_view])
+
+        renderer.context.present(renderer.console, keep_aspect= True, integer_scaling=True)
+        time.sleep(self.delay)
+        return True
+
+    @staticmethod
+    def draw_trail(rgb: np.ndarray, xs: np.ndarray, ys: np.ndarray) -> None:
+        rgb["fg"][xs, ys] = color.n_red
+        rgb["ch"][xs, ys] = ord("*")
+
+    @staticmethod
+    def draw_hits(rgb: np.ndarray, xs: np.ndarray, ys: np.ndarray) -> None:
+        rgb["bg"][xs, ys] = color.n_red
+        rgb["fg"][xs, ys] = color.white
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union, TYPE_CHECKING
+
+import numpy as np
+
+import components.ai
+import util.calc_functions as cf
+from util.random_streams import HAZARDS
+import util.log as log
+
+if TYPE_CHECKING:
+    from engine import Engine
+    from entity import Entity, Hazard
+
+
+class Blast(NamedTuple):
+    """An explosion waiting to be resolved.
+       * `center`, `radius`: the blast area (Chebyshev disk)
+       * `damage`: damage dealt to every actor and feature in the area
+       * `cloud`: hazard spawned on walkable tiles of the `cloud_radius` disk, lasting `cloud_duration` +/- `cloud_spread` turns"""
+    center: Tuple[int, int]
+    radius: int
+    damage: int
+    cloud: Optional[Hazard] = None
+    cloud_radius: int = 0
+    cloud_duration: int = 0
+    cloud_spread: int = 0
+
+
+class CloudField(NamedTuple):
+    """Merged area of the clouds of the same kind left by a wave of blasts"""
+    cloud: Hazard
+    mask: np.ndarray
+    duration: int
+    spread: int
+
+
+def resolve_area(engine: Engine, mask: np.ndarray, damage: Union[int, np.ndarray], *, with_features: bool = True) -> List[Entity]:
+    """Deal `damage` to every target standing in the `mask` area and return them.
+    `damage` is either the same for everyone, or a map sized array giving the damage of each tile.
+    Targets are gathered in one query.
+    A feature destroyed here (barrel...) only queues its own blast, see `DetonationQueue`."""
+    game_map = engine.game_map
+    targets = game_map.get_targets_in_mask(mask, with_features)
+    if not targets:
+        return targets
+
+    if isinstance(damage, np.ndarray):
+        xs = np.fromiter((target.x for target in targets), dtype=np.intp, count=len(targets))
+        ys = np.fromiter((target.y for target in targets), dtype=np.intp, count=len(targets))
+        damages = damage[xs, ys].astype(np.int32)
+    else:
+        damages = np.full(len(targets), damage, dtype=np.int32)
+
+    for target, target_damage in zip(targets, damages.tolist()):
+        if target not in game_map.entities or target.fightable.hp <= 0:
+            # destroyed meanwhile, by the damage dealt to an earlier target
+            continue
+        if target.is_visible:
+            engine.message_log.add_message(
+                f"The {target.name} is engulfed in a fiery explosion, taking {target_damage} damage!"
+            )
+        else:
+            engine.message_log.add_message("You hear a nearby screaming.")
+        target.fightable.take_damage(target_damage)
+
+    return targets
+
+
+class DetonationQueue:
+    """Explosions waiting to be resolved, owned by the engine.
+
+    A barrel dying pushes its blast here. The queue is resolved breadth first within the same tick :
+    all the blasts of a wave are merged (each tile is hit once, by the strongest blast),
+    the features they destroy push the next wave, and the clouds are spawned once per merged area."""
+    parent: Engine
+
+    def __init__(self, engine: Engine):
+        self.parent = engine
+        self.pending: List[Blast] = []
+        self.is_resolving = False
+
+    def push(self, blast: Blast) -> None:
+        """Queue `blast`. Resolve it right away unless a resolution is already running."""
+        self.pending.append(blast)
+        if not self.is_resolving:
+            self.resolve()
+
+    def resolve(self) -> None:
+        self.is_resolving = True
+        try:
+            wave_count = 0
+            while self.pending:
+                wave, self.pending = self.pending, []
+                wave_count += 1
+                self.resolve_wave(wave)
+            if log.debug.combat:
+                log.get(log.COMBAT).debug("Detonation resolved in %s wave(s)", wave_count)
+        finally:
+            self.pending = []
+            self.is_resolving = False
+
+    def resolve_wave(self, wave: List[Blast]) -> None:
+        game_map = self.parent.game_map
+        shape = (game_map.width, game_map.height)
+
+        # one damage map for the whole wave : overlapping tiles take the strongest blast, once
+        damage_map = np.zeros(shape, dtype=np.int32, order="F")
+        for blast in wave:
+            np.maximum(damage_map, cf.get_disk_mask(blast.center, blast.radius, shape) * blast.damage, out=damage_map)
+        resolve_area(self.parent, damage_map > 0, damage_map)
+
+        # one cloud field per hazard type, spawned on tiles free of hazard
+        clouds: Dict[str, CloudField] = {}
+        for blast in wave:
+            if blast.cloud:
+                field = clouds.setdefault(blast.cloud.name, CloudField(blast.cloud, np.zeros(shape, dtype=bool, order="F"), 0, 0))
+                field.mask[cf.get_disk_mask(blast.center, blast.cloud_radius, shape)] = True
+                clouds[blast.cloud.name] = field._replace(duration=max(field.duration, blast.cloud_duration),
+                                                          spread=max(field.spread, blast.cloud_spread))
+        for field in clouds.values():
+            spawn_cloud(self.parent, field)
+
+
+def spawn_cloud(engine: Engine, field: CloudField) -> None:
+    """Spawn the cloud on each walkable tile of the field not already covered by a hazard."""
+    game_map = engine.game_map
+    mask = field.mask & game_map.walkable
+    for hazard in game_map.hazards:
+        mask[hazard.x, hazard.y] = False
+
+    xs, ys = np.nonzero(mask)
+    for x, y in zip(xs.tolist(), ys.tolist()):
+        smoke = field.cloud.spawn(game_map, x, y)
+        smoke.ai = components.ai.FireSmoke(
+            entity=smoke,
+            previous_ai=smoke.ai,
+            turns_remaining=field.duration+engine.rng.get(HAZARDS).randint(-field.spread, field.spread),
+        )
@@ -0,0 +1,80 @@
+"""Bit-packed boolean layer of a map (explored).
+
+Each column x of the map is packed along y, 8 tiles per byte (`np.packbits`), so a layer costs one bit per tile.
+Reads take the same indexes as a bool array : a pair of ints or of int arrays, or a window of slices (unpacked on
+the fly). Windows starting on a byte boundary, like chunk windows, are merged without unpacking.
+"""
+from __future__ import annotations
+
+from typing import Optional, Tuple, Union
+
+import numpy as np  # type: ignore
+
+from chunks import Window
+
+# number of set bits of each byte value
+POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+class BitPlane:
+    def __init__(self, width: int, height: int):
+        self.width, self.height = width, height
+        self.bits = np.zeros((width, -(-height//8)), dtype=np.uint8, order="F")
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.width, self.height
+
+    def window_of(self, x: slice, y: slice) -> Window:
+        """Window with explicit bounds (slices may be open, e.g. `[:, :]`)"""
+        x_start, x_stop, x_step = x.indices(self.width)
+        y_start, y_stop, y_step = y.indices(self.height)
+        if x_step != 1 or y_step != 1:
+            raise IndexError("BitPlane windows do not support steps")
+        return slice(x_start, max(x_start, x_stop)), slice(y_start, max(y_start, y_stop))
+
+    def __getitem__(self, index: Union[slice, Tuple]) -> Union[np.ndarray, np.bool_]:
+        x, y = (index, slice(None)) if isinstance(index, slice) else index
+        if isinstance(x, slice):
+            return self.unpack(self.window_of(x, y))
+        xs, ys = np.asarray(x), np.asarray(y)
+        return ((self.bits[xs, ys >> 3] >> (7 - (ys & 7))) & 1).astype(bool)
+
+    def byte_span(self, window: Window) -> slice:
+        """Bytes of a column holding the rows of the window"""
+        return slice(window[1].start//8, -(-window[1].stop//8))
+
+    def is_aligned(self, window: Window) -> bool:
+        """True if the rows of the window cover whole bytes : packed as is"""
+        y_slice = window[1]
+        return y_slice.start % 8 == 0 and (y_slice.stop % 8 == 0 or y_slice.stop == self.height)
+
+    def unpack(self, window: Optional[Window] = None) -> np.ndarray:
+        """Bool array of the window (default : whole map)"""
+        x_slice, y_slice = window or (slice(0, self.width), slice(0, self.height))
+        offset = y_slice.start % 8
+        bits = np.unpackbits(self.bits[x_slice, self.byte_span((x_slice, y_slice))], axis=1)
+        return np.asfortranarray(bits[:, offset:offset + y_slice.stop - y_slice.start].view(bool))
+
+    def write(self, window: Window, values: Union[bool, np.ndarray]) -> None:
+        x_slice, y_slice = window
+        shape = (x_slice.stop - x_slice.start, y_slice.stop - y_slice.start)
+        values = np.broadcast_to(np.asarray(values, dtype=bool), shape)
+        if not self.is_aligned(window):
+            # partial bytes at the ends : rewrite the whole bytes holding the window
+            byte_rows = slice(y_slice.start//8*8, min(self.height, -(-y_slice.stop//8)*8))
+            plane = self.unpack((x_slice, byte_rows))
+            plane[:, y_slice.start - byte_rows.start:y_slice.stop - byte_rows.start] = values
+            window, values = (x_slice, byte_rows), plane
+        self.bits[x_slice, self.byte_span(window)] = np.packbits(values, axis=1)
+
+    def union(self, window: Window, values: np.ndarray) -> None:
+        """Set the tiles of the window where `values` is True, keep the others"""
+        if self.is_aligned(window):
+            self.bits[window[0], self.byte_span(window)] |= np.packbits(values, axis=1)
+        else:
+            self.write(window, self.unpack(window) | values)
+
+    def count(self) -> int:
+        """Number of set tiles"""
+        return int(POPCOUNT[self.bits].sum(dtype=np.int64))
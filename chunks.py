@@ -0,0 +1,59 @@
+"""Chunk grid of a map.
+
+Work done every turn (FOV, render, hostile pathfinding) runs on a window of whole chunks around what matters,
+so that it costs the same on a 500x500 floor as on a 80x60 one.
+Each chunk also has a revision counter, raised when its tiles change, so that derived data (see `hpa`) is only
+rebuilt where needed.
+"""
+from __future__ import annotations
+
+from typing import Tuple, Union
+
+import numpy as np  # type: ignore
+
+CHUNK_SIZE = 32
+
+Window = Tuple[slice, slice]
+
+
+class MapChunks:
+    def __init__(self, width: int, height: int, size: int = CHUNK_SIZE):
+        self.width, self.height = width, height
+        self.size = size
+        self.revisions = np.zeros((-(-width//size), -(-height//size)), dtype=np.int32, order="F")
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """Number of chunks on each axis"""
+        return self.revisions.shape
+
+    def chunk_of(self, x: int, y: int) -> Tuple[int, int]:
+        return x//self.size, y//self.size
+
+    def chunk_window(self, cx: int, cy: int) -> Window:
+        """Tiles of a chunk"""
+        return (
+            slice(cx*self.size, min(self.width, (cx+1)*self.size)),
+            slice(cy*self.size, min(self.height, (cy+1)*self.size)),
+        )
+
+    def mark_dirty(self, xs: Union[int, np.ndarray], ys: Union[int, np.ndarray]) -> None:
+        """Raise the revision of the chunks holding the changed tiles `xs`, `ys`"""
+        self.revisions[np.asarray(xs)//self.size, np.asarray(ys)//self.size] += 1
+
+    def window(self, x1: int, y1: int, x2: int, y2: int, margin: int = 0) -> Window:
+        """Smallest window of whole chunks holding the box (x1, y1)-(x2, y2) widened by `margin`."""
+        size = self.size
+        left, right = min(x1, x2) - margin, max(x1, x2) + margin
+        top, bottom = min(y1, y2) - margin, max(y1, y2) + margin
+        return (
+            slice(max(0, left//size*size), min(self.width, (right//size+1)*size)),
+            slice(max(0, top//size*size), min(self.height, (bottom//size+1)*size)),
+        )
+
+    def around(self, center: Tuple[int, int], radius: int) -> Window:
+        """Window of whole chunks holding the square of `radius` around `center`"""
+        return self.window(*center, *center, margin=radius)
+
+    def is_whole_map(self, window: Window) -> bool:
+        return window[0].stop - window[0].start == self.width and window[1].stop - window[1].start == self.height
@@ -1,11 +1,13 @@
 from __future__ import annotations
 
-import random
 from typing import List, Optional, Tuple, TYPE_CHECKING
 
 import numpy as np  # type: ignore
 import util.calc_functions as cf
+from chunks import CHUNK_SIZE, Window
+from util.random_streams import AI, HAZARDS
 from various_enum import ItemType
+import util.log as log
 
 import tcod
 import exceptions
@@ -28,33 +30,97 @@ class BaseAI(Action):
         pass
         # raise NotImplementedError()
 
-    def get_path_to(self, dest_x: int, dest_y: int) -> List[Tuple[int, int]]:
+    def fast_forward(self, turns: int) -> None:
+        """Coarse catch-up of the `turns` spent on a floor the player was not on."""
+        pass
+
+    def get_path_to(self, dest_x: int, dest_y: int, margin: int = CHUNK_SIZE) -> List[Tuple[int, int]]:
         """Compute and return a path to the target position.
+        The search is done on the chunks around both ends (widened by `margin`), then on the whole map if it failed.
         If there is no valid path then returns an empty list.
         """
+        gamemap = self.entity.gamemap
+        window = gamemap.chunks.window(self.entity.x, self.entity.y, dest_x, dest_y, margin)
+        path = self.get_path_in_window(dest_x, dest_y, window)
+        if not path and not gamemap.chunks.is_whole_map(window):
+            path = self.get_path_in_window(dest_x, dest_y, (slice(0, gamemap.width), slice(0, gamemap.height)))
+
+        return path
+
+    def get_path_in_window(self, dest_x: int, dest_y: int, window: Window, start: Optional[Tuple[int, int]] = None) -> List[Tuple[int, int]]:
+        """Path from `start` (default : the entity position) to the destination, inside the window."""
+        if start is None:
+            start = (self.entity.x, self.entity.y)
+        left, top = window[0].start, window[1].start
         # Copy the walkable array.
-        cost = np.array(self.entity.gamemap.tiles["walkable"], dtype=np.int8)
+        cost = np.array(self.entity.gamemap.walkable[window], dtype=np.int8)
 
         for entity in self.entity.gamemap.entities:
+            x, y = entity.x-left, entity.y-top
+            if not (0 <= x < cost.shape[0] and 0 <= y < cost.shape[1]):
+                continue
             # Check that an entiy blocks movement and the cost isn't zero (blocking.)
-            if entity.blocks_movement and cost[entity.x, entity.y]:
+            if entity.blocks_movement and cost[x, y]:
                 # Add to the cost of a blocked position.
                 # A lower number means more enemies will crowd behind each other in
                 # hallways.  A higher number means enemies will take longer paths in
                 # order to surround the player.
-                cost[entity.x, entity.y] += 10
+                cost[x, y] += 10
 
         # Create a graph from the cost array and pass that graph to a new pathfinder.
         graph = tcod.path.SimpleGraph(cost=cost, cardinal=2, diagonal=3)
         pathfinder = tcod.path.Pathfinder(graph)
 
-        pathfinder.add_root((self.entity.x, self.entity.y))  # Start position.
+        pathfinder.add_root((start[0]-left, start[1]-top))  # Start position.
 
         # Compute the path to the destination and remove the starting point.
-        path: List[List[int]] = pathfinder.path_to((dest_x, dest_y))[1:].tolist()
+        path = pathfinder.path_to((dest_x-left, dest_y-top))[1:] + (left, top)
 
         # Convert from List[List[int]] to List[Tuple[int, int]].
-        return path #[(index[0], index[1]) for index in path]
+        return path.tolist() #[(index[0], index[1]) for index in path]
+
+    def get_local_path(self, start: Tuple[int, int], dest: Tuple[int, int], margin: int) -> List[Tuple[int, int]]:
+        """Path between two near tiles, searched in their bounding box widened by `margin`"""
+        gamemap = self.entity.gamemap
+        window = (
+            slice(max(0, min(start[0], dest[0])-margin), min(gamemap.width, max(start[0], dest[0])+margin+1)),
+            slice(max(0, min(start[1], dest[1])-margin), min(gamemap.height, max(start[1], dest[1])+margin+1)),
+        )
+        return self.get_path_in_window(dest[0], dest[1], window, start)
+
+    def repair_path(self, path: List[Tuple[int, int]], dest_x: int, dest_y: int, max_shift: int = 2, margin: int = 2) -> List[Tuple[int, int]]:
+        """Return a path to the destination, reusing `path` (the previous one) when possible :
+           * destination moved by up to `max_shift` tiles : only the end of the path is searched again
+           * blocker on the next steps : a short detour is spliced in
+        The whole path is searched again only when there is nothing to reuse or the repair fails."""
+        x, y = self.entity.x, self.entity.y
+        if not path or max(abs(path[0][0]-x), abs(path[0][1]-y)) != 1:
+            return self.get_path_to(dest_x, dest_y)
+        path = [list(step) for step in path]
+
+        end_x, end_y = path[-1]
+        shift = max(abs(end_x-dest_x), abs(end_y-dest_y))
+        if shift > max_shift:
+            return self.get_path_to(dest_x, dest_y)
+        if shift:
+            cut = max(0, len(path)-1-shift)
+            pivot = path[cut-1] if cut else (x, y)
+            tail = self.get_local_path(tuple(pivot), (dest_x, dest_y), margin)
+            if not tail:
+                return self.get_path_to(dest_x, dest_y)
+            path = path[:cut] + tail
+
+        # the destination itself is usually occupied by the target
+        for i, (step_x, step_y) in enumerate(path[:min(3, len(path)-1)]):
+            if self.entity.gamemap.get_blocking_entity_at_location(step_x, step_y):
+                pivot = path[i-1] if i else (x, y)
+                detour = self.get_local_path(tuple(pivot), tuple(path[i+1]), margin)
+                if not detour:
+                    return self.get_path_to(dest_x, dest_y)
+                path = path[:i] + detour + path[i+2:]
+                break
+
+        return path
 
 class HostileEnemy(BaseAI):
     def __init__(self, entity: Actor):
@@ -68,15 +134,16 @@ class HostileEnemy(BaseAI):
         If player move out of view, Enemy base AI will move to the last known position of the player"""
         
         if self.entity.depth != self.engine.game_world.current_floor:
-            # TODO : define what should do these enemies
+            # should not happen : off-floor enemies are parked, see GameMap.fast_forward
             return
         
         
-        if self.engine.game_map.visible[self.entity.x, self.entity.y]:
+        sense = self.engine.senses.of(self.entity)
+        if sense.visible:
             target = self.engine.player
             dx = target.x - self.entity.x
             dy = target.y - self.entity.y
-            distance = max(abs(dx), abs(dy))  # Chebyshev distance.
+            distance = sense.distance  # Chebyshev distance.
             weapon = self.entity.equipment.weapon
 
             # Reset cache as soon as it is not player's turn
@@ -94,10 +161,12 @@ class HostileEnemy(BaseAI):
             else:
                 if weapon.item_type == ItemType.RANGED_WEAPON:
                     if weapon.equippable.current_clip > 0:
-                        if self.entity.distance(target.x, target.y) <= weapon.equippable.base_range:
+                        if sense.in_range:
                             self.engine.hostile_lof.compute(shooter= self.entity, target_xy=(target.x, target.y))
-                            self.engine.logger.debug([entity.name for entity in self.engine.player_lof.entities])
-                            self.path = self.get_path_to(target.x, target.y)
+                            if log.debug.ai:
+                                log.get(log.AI).debug("%s in the line of fire of the player", [entity.name for entity in self.engine.player_lof.entities])
+                            # keep the path to the last known position, in case the player gets out of view
+                            self.path = self.repair_path(self.path, target.x, target.y)
                             # add a return to quit here this perform
                             return FireAction(self.entity, target).act()
                     else:
@@ -107,14 +176,25 @@ class HostileEnemy(BaseAI):
                     if distance <= 1:
                         MeleeAction(self.entity, dx, dy).act()
 
-            self.path = self.get_path_to(target.x, target.y)
+            self.path = self.repair_path(self.path, target.x, target.y)
 
         if self.path:
-            dest_x, dest_y = self.path.pop(0)
-            return MovementAction(self.entity, dest_x - self.entity.x, dest_y - self.entity.y).act()
+            dest_x, dest_y = self.path[0]
+            MovementAction(self.entity, dest_x - self.entity.x, dest_y - self.entity.y).act()
+            # a blocked step stays in the path, to be repaired next turn
+            self.path.pop(0)
+            return
 
         return WaitAction(self.entity).act()
 
+    def fast_forward(self, turns: int) -> None:
+        """Walk the last known path, without fighting, then forget it"""
+        for dest_x, dest_y in self.path[:turns]:
+            if self.entity.gamemap.get_blocking_entity_at_location(dest_x, dest_y):
+                break
+            self.entity.move(dest_x - self.entity.x, dest_y - self.entity.y)
+        self.path = []
+
 class ConfusedEnemy(BaseAI):
     """
     A confused enemy will stumble around aimlessly for a given number of turns, then revert back to its previous AI.
@@ -136,7 +216,7 @@ class ConfusedEnemy(BaseAI):
             self.entity.ai = self.previous_ai
         else:
             # Pick a random direction
-            direction_x, direction_y = random.choice(
+            direction_x, direction_y = self.engine.rng.get(AI).choice(
                 [
                     (-1, -1),  # Northwest
                     (0, -1),  # North
@@ -155,6 +235,11 @@ class ConfusedEnemy(BaseAI):
             # Its possible the actor will just bump into the wall, wasting a turn.
             return BumpAction(self.entity, direction_x, direction_y,).act()
 
+    def fast_forward(self, turns: int) -> None:
+        self.turns_remaining -= turns
+        if self.turns_remaining <= 0:
+            self.entity.ai = self.previous_ai
+
 class SmokeVanish(BaseAI):
     """
     Entity will be removed after a delay
@@ -167,45 +252,54 @@ class SmokeVanish(BaseAI):
         self.turns_remaining = turns_remaining
         self.init_delay = turns_remaining
         self.spawn_others = spawn_others
-        self.engine.game_map.tiles["transparent"][self.entity.x, self.entity.y] = False
+        self.engine.game_map.set_transparent(self.entity.x, self.entity.y, False)
         
     def act(self) -> None:
         # Revert the AI back to the original state if the effect has run its course.
         if self.turns_remaining <= 0:
-            self.engine.game_map.tiles["transparent"][self.entity.x, self.entity.y] = True
-            self.entity.ai = self.previous_ai
-            self.entity.remove()
-            self.entity.fightable.hp = 0 # trigger death
+            self.vanish()
             return
         
         self.entity.color = self.get_cloud_color()
 
-        if self.turns_remaining <= self.init_delay//3 +random.randint(-1,1):
+        rng = self.engine.rng.get(HAZARDS)
+        if self.turns_remaining <= self.init_delay//3 +rng.randint(-1,1):
             self.entity.char = "°"
             self.entity.fightable.base_attack //= 2
-            self.engine.game_map.tiles["transparent"][self.entity.x, self.entity.y] = True
-        elif self.turns_remaining <= self.init_delay//2+random.randint(-1,1):
+            self.engine.game_map.set_transparent(self.entity.x, self.entity.y, True)
+        elif self.turns_remaining <= self.init_delay//2+rng.randint(-1,1):
             self.entity.char = "¤"
-            self.engine.game_map.tiles["transparent"][self.entity.x, self.entity.y] = True
+            self.engine.game_map.set_transparent(self.entity.x, self.entity.y, True)
         else:
             self.entity.char = "§"
-            if self.spawn_others and random.random() > 0.9:
+            if self.spawn_others and rng.random() > 0.9:
                 self.turns_remaining +=2
-                for (x,y) in cf.disk_coords((self.entity.x,self.entity.y), 1):
-                    if self.engine.game_map.tiles["walkable"][x,y]:
-                        if not isinstance(self.engine.game_map.get_hazard_at_location(x,y), Hazard):
-                            entity = self.get_cloud()
-                            smoke = entity.spawn(self.engine.game_map,x,y)
-                            smoke.ai = SmokeVanish(entity=smoke, previous_ai=smoke.ai, turns_remaining=self.turns_remaining+random.randint(0,2),spawn_others=False)
+                for (x,y) in cf.walkable_disk_coords((self.entity.x,self.entity.y), 1, self.engine.game_map.walkable).tolist():
+                    if not isinstance(self.engine.game_map.get_hazard_at_location(x,y), Hazard):
+                        entity = self.get_cloud()
+                        smoke = entity.spawn(self.engine.game_map,x,y)
+                        smoke.ai = SmokeVanish(entity=smoke, previous_ai=smoke.ai, turns_remaining=self.turns_remaining+rng.randint(0,2),spawn_others=False)
 
 
         self.turns_remaining -= 1
 
+    def vanish(self) -> None:
+        self.entity.gamemap.set_transparent(self.entity.x, self.entity.y, True)
+        self.entity.ai = self.previous_ai
+        self.entity.remove()
+        self.entity.fightable.hp = 0 # trigger death
+
+    def fast_forward(self, turns: int) -> None:
+        """Clouds keep fading while nobody looks, but do not spread"""
+        self.turns_remaining -= turns
+        if self.turns_remaining <= 0:
+            self.vanish()
+
     def get_cloud_color(self) -> Hazard:
         if self.entity.name == "Fog":
-            return random.choice([color.n_gray, color.b_darkgray])
+            return self.engine.rng.get(HAZARDS).choice([color.n_gray, color.b_darkgray])
         elif self.entity.name == "Bright Fire":
-            return random.choice([color.b_orange, color.b_yellow, color.n_red])
+            return self.engine.rng.get(HAZARDS).choice([color.b_orange, color.b_yellow, color.n_red])
 
     def get_cloud(self) -> Hazard:
         import entity_factories
@@ -272,11 +366,11 @@ class ExploreMap(BaseAI):
         dist = 1000
 
         # Copy the walkable array, changing boolean to 0 and 1
-        walkable = np.array(self.entity.gamemap.tiles["walkable"], np.int8)
+        walkable = np.array(self.entity.gamemap.walkable, np.int8)
         # TODO : I believe I can add all walls with a 1000 value, this will prevent any passage through a wall and still request exploration.
         # -> will be at the end, but will still continue to check all possible tiles, not good
         size_walkable = walkable.sum()
-        size_explored = game_map.explored.sum() # TODO : explored includes all wall, and also non_walkables -> comparison is not yet efficient
+        size_explored = game_map.explored.count() # TODO : explored includes all wall, and also non_walkables -> comparison is not yet efficient
         # print(size_walkable)
         # print(size_explored)
 
@@ -289,19 +383,20 @@ class ExploreMap(BaseAI):
         # context.present(console)
         # time.sleep(0.2)
 
+        # one pathfinder for the whole search : distances from the player are computed once and reused for each candidate
+        graph = tcod.path.SimpleGraph(cost=walkable, cardinal=2, diagonal=3)
+        pathfinder = tcod.path.Pathfinder(graph)
+        pathfinder.add_root((player.x, player.y))  # Start position.
+        unexplored = walkable.astype(bool) & ~game_map.explored.unpack()
+
         while result is None:
             radius += 1
-            for [target_x, target_y] in cf.circle_coords(center=(player.x, player.y), radius=radius):
-                if self.engine.game_map.in_bounds(target_x, target_y):
-                    # print(f"player {(self.engine.player.x,self.engine.player.y)} - radius {radius} - target {(target_x, target_y)} - walkable {walkable[target_x,target_y]} - explored {game_map.explored[target_x,target_y]} - inbound {self.engine.game_map.in_bounds(target_x, target_y)}")
-                    if walkable[target_x,target_y] and not game_map.explored[target_x,target_y]:
-                        graph = tcod.path.SimpleGraph(cost=walkable, cardinal=2, diagonal=3)
-                        pathfinder = tcod.path.Pathfinder(graph)
-                        pathfinder.add_root((player.x, player.y))  # Start position.
-                        path: List[List[int]] = pathfinder.path_to((target_x, target_y))[1:].tolist()
-                        if len(path) < dist:
-                            dist = len(path)
-                            result = path
+            ring = cf.circle_coords(center=(player.x, player.y), radius=radius, shape=walkable.shape)
+            for [target_x, target_y] in ring[unexplored[ring[:,0], ring[:,1]]].tolist():
+                path: List[List[int]] = pathfinder.path_to((target_x, target_y))[1:].tolist()
+                if len(path) < dist:
+                    dist = len(path)
+                    result = path
             if radius >= 60: # TODO can be optimized using count of tiles to explore vs explored
                 # self.engine.message_log.add_message("There is nowhere else to explore.")
                 raise exceptions.AutoQuit("There is nowhere else to explore.")
@@ -312,6 +407,7 @@ class MoveTo(BaseAI):
     def __init__(self, entity: Actor, previous_ai: BaseAI, dest_xy: Tuple(int, int)):
         super().__init__(entity)
         self.path: List[Tuple[int,int]] = []
+        self.waypoints: List[Tuple[int,int]] = [] # see TravelGraph, path is the current leg
         self.previous_ai = previous_ai # not used (player only)
         self.is_auto = True
         self.target = "destination" # TODO : use a type enum to define the different target
@@ -330,11 +426,12 @@ class MoveTo(BaseAI):
         player = self.entity
 
         if len(self.path) == 0:
-            walkable = np.array(self.entity.gamemap.tiles["walkable"], np.int8)
-            graph = tcod.path.SimpleGraph(cost=walkable, cardinal=2, diagonal=3)
-            pathfinder = tcod.path.Pathfinder(graph)
-            pathfinder.add_root((player.x, player.y))  # Start position.
-            self.path: List[List[int]] = pathfinder.path_to(self.dest_xy)[1:].tolist()
+            travel_graph = self.entity.gamemap.travel_graph
+            if not self.waypoints or self.waypoints[0] != (player.x, player.y):
+                self.waypoints = travel_graph.find_waypoints((player.x, player.y), tuple(self.dest_xy))
+            if len(self.waypoints) >= 2:
+                self.path = travel_graph.refine(self.waypoints[0], self.waypoints[1])
+                self.waypoints.pop(0)
 
         if len(self.path) == 0:
             self.is_auto = False
@@ -1,10 +1,11 @@
 from __future__ import annotations
 
 from typing import Optional, TYPE_CHECKING
-import random
 import util.calc_functions as cf
+from util.random_streams import HAZARDS
 
 import actions
+import area_effect
 import color
 import components.ai
 import entity_factories
@@ -61,7 +62,7 @@ class SpeedConsumable(Consumable):
         self.speed = speed
 
     def activate(self, action: actions.ItemAction) -> None:
-        action.entity.effects[EffectType.SPEED.value] = {"duration": self.duration, "speed": self.speed, "name": "Speed"}
+        action.entity.add_effect(EffectType.SPEED, self.duration, speed=self.speed, name="Speed")
         self.consume()
 
 
@@ -146,22 +147,12 @@ class FireballConsumable(Consumable):
         if not self.engine.game_map.visible[target_xy]:
             raise Impossible("You cannot target an area that you cannot see.")
 
-        targets_hit = False
-        for actor in self.engine.game_map.actors:
-            if actor.distance(*target_xy) <= self.radius:
-                if actor.is_visible:
-                    self.engine.message_log.add_message(
-                        f"The {actor.name} is engulfed in a fiery explosion, taking {self.damage} damage!"
-                    )
-                else:
-                    self.engine.message_log.add_message(
-                        f"Your hear a nearby screaming."
-                    )
-                actor.fightable.take_damage(self.damage)
-                targets_hit = True
-
-        if not targets_hit:
+        game_map = self.engine.game_map
+        mask = cf.get_disk_mask(target_xy, self.radius, (game_map.width, game_map.height))
+        if not game_map.get_targets_in_mask(mask, with_features=False):
             raise Impossible("There are no targets in the radius.")
+
+        area_effect.resolve_area(self.engine, mask, self.damage, with_features=False)
         
         self.consume()
 
@@ -187,9 +178,8 @@ class SmokeGrenadeConsumable(Consumable):
             raise Impossible("You cannot target an area that you cannot see.")
 
         entity = entity_factories.fog_cloud
-        for (x,y) in cf.disk_coords(target_xy, self.radius):
-            if self.gamemap.tiles["walkable"][x,y]:
-                smoke = entity.spawn(self.gamemap,x,y)
-                smoke.ai = components.ai.SmokeVanish(entity=smoke, previous_ai=smoke.ai, turns_remaining=self.delay+random.randint(-2,2), spawn_others=True, )
+        for (x,y) in cf.walkable_disk_coords(target_xy, self.radius, self.gamemap.walkable).tolist():
+            smoke = entity.spawn(self.gamemap,x,y)
+            smoke.ai = components.ai.SmokeVanish(entity=smoke, previous_ai=smoke.ai, turns_remaining=self.delay+self.engine.rng.get(HAZARDS).randint(-2,2), spawn_others=True, )
 
         self.consume()
@@ -6,10 +6,12 @@ from typing import Optional, Tuple, TYPE_CHECKING
 
 import actions
 import color
-import time
 import tcod.los
+import numpy as np
 
 import util.calc_functions as cf
+import util.log as log
+import area_effect
 
 from components.base_component import BaseComponent
 from various_enum import EquipmentSlot, SizeClass
@@ -20,6 +22,8 @@ from exceptions import Impossible
 
 from entity import Actor, Entity, Item
 
+combat_logger = log.get(log.COMBAT)
+
 class Equippable(BaseComponent):
     parent: Item
 
@@ -123,47 +127,23 @@ class RangedWeapon(Equippable):
             hit_margin, target = stray_fire(fire_line)
 
         if hit_margin is not None:
-            if self.engine.renderer:
-                context = self.engine.renderer.context
-                console = self.engine.renderer.console
-            else:
-                raise NotImplementedError                    
-
             if self.radius is not None: # self radius can be 0 for a one square only effet
-                # TODO : howto join 2 generator ? TODO : use onlus cf.disk to avoid parsing the whole map
-                for i,j in cf.disk_coords(target_xy,self.radius):
-                    blast_target = self.engine.game_map.get_target_at_location(i,j)
-                    if blast_target:
-                        damage, armor_reduction = damage_calculation(weapon, blast_target, 0)
-                        if blast_target.is_visible:
-                            self.engine.message_log.add_message(
-                                f"The {blast_target.name} is engulfed in a fiery explosion, taking {damage} damage!"
-                            )
-                        else:
-                            self.engine.message_log.add_message(
-                                f"Your hear a nearby screaming."
-                            )
-                        blast_target.fightable.take_damage(damage)
+                game_map = self.engine.game_map
+                # same damage for everyone in the blast : base damage and shooter aim bonus
+                damage = self.base_damage + getattr(shooter, "aim_stack", 0)
+                # first wave of the detonation : barrels destroyed by the blast explode in the next waves
+                self.engine.detonations.push(area_effect.Blast(center=target_xy, radius=self.radius, damage=damage))
                         
                 # Animation
-                # TODO move to renderer or other dedicated module/class
-                # call draw_line, draw_explosion, draw_bullet, draw_xxx with origin, target, color, char, delay,...
-                fire_line = tcod.los.bresenham((shooter.x, shooter.y),target_xy).tolist()
-                fire_line.pop(0)
-                for [i, j] in fire_line:
-                    if self.engine.game_map.get_target_at_location(i, j):
-                        console.rgb["bg"][self.engine.renderer.shift(i,j)] = color.n_red
-                        console.rgb["fg"][self.engine.renderer.shift(i,j)] = color.white
-                    else:
-                        console.rgb["fg"][self.engine.renderer.shift(i,j)] = color.n_red
-                        console.rgb["ch"][self.engine.renderer.shift(i,j)] = ord("*")
-
-                for (x,y) in cf.disk_coords(target_xy, self.radius):
-                    if self.engine.game_map.tiles["walkable"][x,y] and self.engine.game_map.visible[x,y]:
-                        console.rgb["fg"][self.engine.renderer.shift(x,y)] = color.n_red  # add color of weapon 
-                        console.rgb["ch"][self.engine.renderer.shift(x,y)] = ord("*")
-                context.present(console, keep_aspect= True, integer_scaling=True)
-                time.sleep(0.05)         
+                if self.engine.animations.enabled:
+                    path = tcod.los.bresenham((shooter.x, shooter.y),target_xy).tolist()[1:]
+                    hits = [(i, j) for i, j in path if game_map.get_target_at_location(i, j)]
+                    blast = [
+                        (x, y)
+                        for x, y in cf.walkable_disk_coords(target_xy, self.radius, game_map.walkable).tolist()
+                        if game_map.visible[x, y]
+                    ]
+                    self.engine.animations.push([(i, j) for i, j in path if (i, j) not in hits] + blast, hits)
             else:
                 if target == None:
                     self.engine.message_log.add_message(f"{shooter.name.capitalize()} shoots an empty space.")
@@ -195,15 +175,9 @@ class RangedWeapon(Equippable):
                     target.fightable.take_damage(max(0, damage//2-armor_reduction))
 
                 # Animation
-                for [i, j] in fire_line.path:
-                    if self.engine.game_map.get_actor_at_location(i, j):
-                        console.rgb["bg"][self.engine.renderer.shift(i,j)] = color.n_red
-                        console.rgb["fg"][self.engine.renderer.shift(i,j)] = color.white
-                    else:
-                        console.rgb["fg"][self.engine.renderer.shift(i,j)] = color.n_red
-                        console.rgb["ch"][self.engine.renderer.shift(i,j)] = ord("*")
-                context.present(console, keep_aspect= True, integer_scaling=True)
-                time.sleep(0.05)
+                if self.engine.animations.enabled:
+                    hits = [(i, j) for i, j in fire_line.path if self.engine.game_map.get_actor_at_location(i, j)]
+                    self.engine.animations.push([(i, j) for i, j in fire_line.path if (i, j) not in hits], hits)
         else:
             if target:
                 self.engine.message_log.add_message(f"{shooter.name.capitalize()} missed.")
@@ -214,7 +188,7 @@ class RangedWeapon(Equippable):
         self.current_clip -= 1
 
         # log combat information
-        if self.engine.logger.level <= 20:    # 20 for INFO messages
+        if log.debug.combat:
             if target and target.name != "Wall": 
                 lof = self.engine.get_fire_line(shooter=shooter)
                 ATT, DEF, COV = lof.get_hit_stat(target_xy=(target.x, target.y),target=target)
@@ -222,12 +196,12 @@ class RangedWeapon(Equippable):
                     armor_suit = target.equipment.armor_suit.name
                 except AttributeError:
                     armor_suit = "None"                
-                self.engine.logger.info(msg=f"*** {shooter.name.upper()} fights {target.name.upper()}.")
-                self.engine.logger.info(msg=f"Shooter - ATT:{ATT} WEAPON:{self.parent.name}({self.base_damage})")
-                self.engine.logger.info(msg=f"Shooter - bend:{shooter.bend}")
-                self.engine.logger.info(msg=f"Target  - DEF:{DEF} COV:{COV} {[entity.name for entity in lof.entities]}")
-                self.engine.logger.info(msg=f"Target  - AC: {target.fightable.armor} SUIT:{armor_suit}") #{if isinstance(target.equipment.}.")
-                self.engine.logger.info(msg=f"HitMargin:{hit_margin} Damage:{damage}")                
+                combat_logger.debug("*** %s fights %s.", shooter.name.upper(), target.name.upper())
+                combat_logger.debug("Shooter - ATT:%s WEAPON:%s(%s)", ATT, self.parent.name, self.base_damage)
+                combat_logger.debug("Shooter - bend:%s", shooter.bend)
+                combat_logger.debug("Target  - DEF:%s COV:%s %s", DEF, COV, [entity.name for entity in lof.entities])
+                combat_logger.debug("Target  - AC: %s SUIT:%s", target.fightable.armor, armor_suit)
+                combat_logger.debug("HitMargin:%s Damage:%s", hit_margin, damage)
 
         return hit_margin, target
 
@@ -238,11 +212,15 @@ class RangedWeapon(Equippable):
         weapon = self.parent
 
         lof = self.engine.get_fire_line(shooter)
-        target_area=cf.get_cone_points(start=lof.shooter_xy,end=lof.target_xy,cone_radius=self.cone,dist=5)
+        target_area = cf.get_cone_mask(start=lof.shooter_xy, end=lof.target_xy, cone_radius=self.cone,
+                                       shape=(self.engine.game_map.width, self.engine.game_map.height))
 
-        for point in target_area:
+        xs, ys = np.nonzero(target_area)
+        hits = []
+        for point in zip(xs.tolist(), ys.tolist()):
             target = self.engine.game_map.get_target_at_location(*point)
             if target:
+                hits.append(point)
                 lof.compute(shooter,(target.x,target.y))
                 hit_margin, target = hit_calculation(shooter, target)
                 damage, armor_reduction = damage_calculation(weapon, target, max(hit_margin,0))
@@ -263,6 +241,10 @@ class RangedWeapon(Equippable):
                     )
                 target.fightable.take_damage(damage)
 
+        # Animation
+        if self.engine.animations.enabled:
+            visible = self.engine.game_map.visible[xs, ys].tolist()
+            self.engine.animations.push([point for point, seen in zip(zip(xs.tolist(), ys.tolist()), visible) if seen and point not in hits], hits)
 
         # use ammunition
         self.current_clip -= 1
@@ -1,12 +1,7 @@
 from __future__ import annotations
 
-import copy
-import random
-
 from typing import TYPE_CHECKING
 
-import util.calc_functions as cf
-
 import color
 import entity_factories
 import components.ai
@@ -15,7 +10,10 @@ from exceptions import Dead
 from components.base_component import BaseComponent
 from components.equippable import RangedWeapon
 from render_order import RenderOrder
-from actions import ItemAction, DropItem
+from actor_stats import ActorStats
+from various_enum import EffectType
+from actions import DropItem
+from area_effect import Blast
 
 # if TYPE_CHECKING:
 from entity import Actor, Entity, Feature
@@ -24,6 +22,10 @@ class Fightable(BaseComponent):
     parent: Entity
 
     def __init__(self, hp: int, base_defense: int = 0, base_armor: int = 0, base_attack: int = 0):
+        # hot numbers live in a struct of arrays store, private until the owner is placed on a map (see ActorStats)
+        self._stats = ActorStats(capacity=1)
+        self._slot = self._stats.allocate(self)
+
         self.max_hp = hp
         self._hp = hp*100
         self.base_defense = base_defense
@@ -32,6 +34,44 @@ class Fightable(BaseComponent):
         self.stun_point = 0 # TODO : use _sp as float and sp as int, sp = round-(_sp)
         self.regen_rate = 0
 
+    @property
+    def _hp(self) -> int:
+        return int(self._stats.data["hp"][self._slot])
+
+    @_hp.setter
+    def _hp(self, value: int) -> None:
+        self._stats.data["hp"][self._slot] = value
+
+    @property
+    def max_hp(self) -> int:
+        return int(self._stats.data["max_hp"][self._slot])
+
+    @max_hp.setter
+    def max_hp(self, value: int) -> None:
+        self._stats.data["max_hp"][self._slot] = value
+
+    @property
+    def stun_point(self) -> int:
+        return int(self._stats.data["stun_point"][self._slot])
+
+    @stun_point.setter
+    def stun_point(self, value: int) -> None:
+        self._stats.data["stun_point"][self._slot] = value
+
+    @property
+    def regen_rate(self) -> int:
+        return int(self._stats.data["regen_rate"][self._slot])
+
+    @regen_rate.setter
+    def regen_rate(self, value: int) -> None:
+        self._stats.data["regen_rate"][self._slot] = value
+
+    def get_effect_duration(self, effect: EffectType) -> int:
+        return int(self._stats.data["effects"][self._slot, effect.value-1])
+
+    def set_effect_duration(self, effect: EffectType, duration: int) -> None:
+        self._stats.data["effects"][self._slot, effect.value-1] = duration
+
     @property
     def hp(self) -> int:
         return self._hp//100
@@ -159,76 +199,41 @@ class Fighter(Fightable):
 
 class Barrel(Fightable):
     parent: Feature
-    
+
+    def get_blast(self) -> Blast:
+        """Blast of the barrel : the one of a grenade launcher shot at the barrel location"""
+        grenade_launcher = entity_factories.grenade_launcher.equippable
+        return Blast(center=(self.parent.x, self.parent.y), radius=grenade_launcher.radius, damage=grenade_launcher.base_damage)
+
     def die(self) -> None:
         death_message = f"{self.parent.name} explodes!"
         death_message_color = color.enemy_die
 
         self.engine.message_log.add_message(death_message,death_message_color)
- 
-        # seems the simplest turnaround
-        grenade_launcher = copy.deepcopy(entity_factories.grenade_launcher)
-        grenade_launcher.parent = self.gamemap
-        item_action = ItemAction(self.parent, grenade_launcher)
-        grenade_launcher.equippable.activate(item_action)
-
         self.parent.remove()
 
-class ToxicBarrel(Fightable):
+        # a chain reaction is queued, not recursed into
+        self.engine.detonations.push(self.get_blast())
+
+class ToxicBarrel(Barrel):
     parent: Feature
 
     def __init__(self, hp: int, base_defense: int = 0, base_attack: int = 0, radius: int = 1):
         super().__init__(hp, base_defense, base_attack)
         self.radius = radius
 
-    def die(self) -> None:
-        death_message = f"{self.parent.name} explodes!"
-        death_message_color = color.enemy_die
-
-        self.engine.message_log.add_message(death_message,death_message_color)
-        self.parent.remove()
-
-        # seems the simplest turnaround
-        grenade_launcher = copy.deepcopy(entity_factories.grenade_launcher)
-        grenade_launcher.parent = self.gamemap
-        item_action = ItemAction(self.parent, grenade_launcher)
-        grenade_launcher.equippable.activate(item_action)
+    def get_blast(self) -> Blast:
+        return super().get_blast()._replace(cloud=entity_factories.toxic_smoke, cloud_radius=self.radius, cloud_duration=4, cloud_spread=1)
 
-        # smoke cloud gen
-        entity = entity_factories.toxic_smoke
-        for (x,y) in cf.disk_coords((self.parent.x, self.parent.y), self.radius):
-            if self.gamemap.tiles["walkable"][x,y]:
-                smoke = entity.spawn(self.gamemap,x,y)
-                smoke.ai = components.ai.FireSmoke(entity=smoke, previous_ai=smoke.ai, turns_remaining=4+random.randint(-1,1),)
-
-class ExplosiveBarrel(Fightable):
+class ExplosiveBarrel(Barrel):
     parent: Feature
 
     def __init__(self, hp: int, base_defense: int = 0, base_attack: int = 0, radius: int = 1):
         super().__init__(hp, base_defense, base_attack)
         self.radius = radius
 
-    def die(self) -> None:
-        death_message = f"{self.parent.name} explodes!"
-        death_message_color = color.enemy_die
-
-        self.engine.message_log.add_message(death_message,death_message_color)
-        self.parent.remove()
-
-        # seems the simplest turnaround
-        grenade_launcher = copy.deepcopy(entity_factories.grenade_launcher)
-        grenade_launcher.parent = self.gamemap
-        
-        self.gamemap.engine.hostile_lof.compute(shooter=self.parent,target_xy=(self.parent.x,self.parent.y))
-        item_action = ItemAction(entity=self.parent, item=grenade_launcher) # TODO : self.parent already removed... but self.parent = barrel and item = grenade_laucher
-        grenade_launcher.equippable.activate(item_action)
-
-        # smoke cloud gen
-        entity = entity_factories.fire_cloud
-        for (x,y) in cf.disk_coords((self.parent.x, self.parent.y), self.radius):
-            if self.gamemap.tiles["walkable"][x,y]:
-                smoke = entity.spawn(self.gamemap,x,y)
-                smoke.ai = components.ai.FireSmoke(entity=smoke, previous_ai=smoke.ai, turns_remaining=6+random.randint(-2,2),)
+    def get_blast(self) -> Blast:
+        return super().get_blast()._replace(cloud=entity_factories.fire_cloud, cloud_radius=self.radius, cloud_duration=6, cloud_spread=2)
 
 class Smoke(Fightable): # does it need to be a Fightable? I don't think so
     parent: Feature
@@ -10,6 +10,7 @@ from typing import Any,Iterator
 
 import util.var_global
 import util.event
+import util.log
 
 import exceptions
 import input_handlers
@@ -40,11 +41,8 @@ def main(stdscr) -> None:
     # screen_height = 24 #50
     screen_width, screen_height = curses.COLS-1, curses.LINES
     # log tool
-    Log_Format = "%(levelname)s %(asctime)s - %(message)s"
-    logging.basicConfig(
-        filename="logfile.log", filemode="w", format=Log_Format, level=logging.DEBUG
-    )
-    logger = logging.getLogger()
+    util.log.setup()
+    logger = logging.getLogger(util.log.TECH_LOGGER)
     util.var_global.logger = logger
 
     curses.start_color()
@@ -71,7 +69,8 @@ def main(stdscr) -> None:
             if resize:
                 resize = False
                 curses.resizeterm(*stdscr.getmaxyx())
-                logger.debug(f"stdscr cols={curses.COLS} lines={curses.LINES}")
+                if util.log.debug.engine:
+                    util.log.get(util.log.ENGINE).debug("stdscr cols=%s lines=%s", curses.COLS, curses.LINES)
                 stdscr.getch() # to purge signal from resizeterm (and avoid infinite loop)
                 renderer.view_width=(curses.COLS-1)-40
                 if renderer.view_width//2 == renderer.view_width/2:
@@ -8,21 +8,27 @@ import util.event
 
 from logging import Logger
 from util.calc_functions import progress_color
-from various_enum import ItemType
+from various_enum import EffectType, ItemType
 
 
 from render_functions import render_ascii_bar, render_ascii_slider
 from message_log import MessageLog
 
 import util.var_global as uv
+import util.log as log
 
 import exceptions
-import lzma
-import pickle
 import color
+import save_file
 from input_handlers import BaseEventHandler, GameOverEventHandler, MainGameEventHandler
 from turnqueue import TurnQueue
 from fire_line import FireLine
+from area_effect import DetonationQueue
+from sensing import HostileSenses
+from animation import AnimationQueue
+from input_buffer import InputBuffer
+from idle import IdleScheduler
+from util.random_streams import RandomStreams
 
 if TYPE_CHECKING:
     from entity import Actor
@@ -34,13 +40,15 @@ class Engine:
     game_map: GameMap
     game_world: GameWorld
     
-    def __init__(self, player: Actor):
+    def __init__(self, player: Actor, world_seed: int = -1):
         self.player = player
+        self.rng = RandomStreams(world_seed)
         self.renderer: Renderer = None
         self.message_log = MessageLog()
         self.logger: Logger = None
         self.end_turn: bool = True # player has made a valid action
         self.is_keypressed: bool = True # key stroke
+        self.window_resized: bool = False # the main loop fits the console to the window
 
         self.turnqueue: TurnQueue = TurnQueue()
         self.active_entity = None
@@ -49,6 +57,12 @@ class Engine:
         self.player_lof = FireLine(self)
         # self.player_lof: FireLine = None
         self.hostile_lof = FireLine(self)
+        self.detonations = DetonationQueue(self)
+        self.senses = HostileSenses(self)
+        self.animations = AnimationQueue(self)
+        self.autosave = save_file.Autosave(self)
+        self.input_buffer = InputBuffer(self)
+        self.idle = IdleScheduler(self)
 
     def turn_loop(self, handler: BaseEventHandler) -> BaseEventHandler:
         """Plays all entities and ends with player."""
@@ -59,27 +73,35 @@ class Engine:
             if self.active_entity is self.player:
                 if self.is_keypressed:
                     ### LOG
-                    self.logger.debug(f"Turn queue time {self.turnqueue.current_time}")
-                    self.logger.debug(f"TQ size: {len(self.turnqueue.heap)}")
-                    msg = ""
-                    player = 0
-                    for ticket in sorted(self.turnqueue.heap):
-                        msg += f"{ticket.entity.name}:{ticket.time},{ticket.ticket_id} - "
-                        if ticket.entity is self.player:
-                            player += 1
-                    self.logger.debug(f"TQ:{msg}")
-                    # assert player == 0
+                    if log.debug.engine:
+                        engine_logger = log.get(log.ENGINE)
+                        engine_logger.debug("Turn queue time %s", self.turnqueue.current_time)
+                        engine_logger.debug("TQ size: %s", len(self.turnqueue.heap))
+                        msg = ""
+                        for ticket in sorted(self.turnqueue.heap):
+                            msg += f"{ticket.entity.name}:{ticket.time},{ticket.ticket_id} - "
+                        engine_logger.debug("TQ:%s", msg)
                     ### LOG
 
+                if self.is_keypressed and not self.input_buffer.can_skip_render(handler):
                     """render all previous actions (and avoid render for non-valid event)
-                        -> has to be done before the next keystroke, thus the self.is_keypressed"""
+                        -> has to be done before the next keystroke, thus the self.is_keypressed
+                        (keys typed ahead are played first, see InputBuffer)"""
                     self.renderer.console.clear()
                     handler.on_render(renderer=self.renderer)
+                    if self.animations.play(self.renderer):
+                        # shots of the turn were shown over the map, render it again without them
+                        self.renderer.console.clear()
+                        handler.on_render(renderer=self.renderer)
                     self.renderer.context.present(self.renderer.console, keep_aspect= True, integer_scaling=True)
+                    self.input_buffer.rendered()
 
                 self.end_turn = False # to prevent other event (windowfocus, keyup) to trigger the loop
+                if self.is_keypressed:
+                    # waiting for the player : background work until a key comes
+                    self.idle.run()
                 self.is_keypressed = False
-                for event in util.event.wait():
+                for event in self.input_buffer.events():
                     if isinstance(event, tcod.event.KeyDown):
                         self.is_keypressed = True
                         try:
@@ -91,7 +113,10 @@ class Engine:
                             self.message_log.add_message(exc.args[0], color.impossible)
                             handler = MainGameEventHandler(self)
                     elif isinstance(event, tcod.event.WindowResized):
-                        resize = True
+                        self.window_resized = True
+                        self.is_keypressed = True # render again once resized
+                    elif isinstance(event, tcod.event.Quit):
+                        handler.handle_events(event) # save and quit
                 
                 if self.end_turn:
                     self.update_fov()
@@ -119,13 +144,20 @@ class Engine:
                     # render all previous actions
                     self.renderer.console.clear()
                     handler.on_render(renderer=self.renderer)
+                    if self.animations.play(self.renderer):
+                        self.renderer.console.clear()
+                        handler.on_render(renderer=self.renderer)
                     self.renderer.context.present(self.renderer.console, keep_aspect= True, integer_scaling=True)
 
+                # long auto travels are saved too, before the player acts
+                self.autosave.check()
+
                 ##### Events that stops the auto loop #####
                 
                 # Stop auto if a key is pressed
                 for event in util.event.get():
                     if isinstance(event, tcod.event.KeyDown):
+                        self.animations.skip()
                         self.player.ai.is_auto = False
                         self.logger.info(f"Auto-mode {self.player.ai.is_auto}")
                         handler = MainGameEventHandler(self)
@@ -152,15 +184,21 @@ class Engine:
         """Activate regular timer"""
         self.turn_count += increment
         self.turnqueue.last_time = self.turnqueue.current_time 
+        # whole map at once, through the stats store
+        stats = self.game_map.actor_stats
+        for slot in stats.tick(increment).tolist():
+            stats.owners[slot].parent.sync_effects()
+
+        # actors whose numbers are not in the map store
         for actor in self.game_map.actors:
+            if actor.fightable._stats is stats:
+                continue
             actor.fightable.recover_stun(increment)
             actor.fightable.regen_hp(increment)
-
-            if actor.effects:
-                for key in list(actor.effects):
-                    actor.effects[key]['duration'] -= 1
-                    if actor.effects[key]['duration'] == 0:
-                        del actor.effects[key]
+            for key in list(actor.effects):
+                effect = EffectType(key)
+                actor.fightable.set_effect_duration(effect, max(0, actor.fightable.get_effect_duration(effect)-increment))
+            actor.sync_effects()
 
     def handle_enemy_turns(self) -> None:
             try:
@@ -175,15 +213,22 @@ class Engine:
                 pass
 
     def update_fov(self) -> None:
-        """Recompute the visible area based on the players point of view."""
-        self.game_map.visible[:] = compute_fov(
-            self.game_map.tiles["transparent"],
-            (self.player.x, self.player.y),
-            radius=10, # FOV radius
+        """Recompute the visible area based on the players point of view.
+        Only the chunks around the player are computed, the rest of the map can't be visible."""
+        game_map = self.game_map
+        radius = 10 # FOV radius
+        game_map.visible[game_map.fov_window] = False
+        window = game_map.chunks.around((self.player.x, self.player.y), radius+1)
+        visible = compute_fov(
+            game_map.transparent[window],
+            (self.player.x-window[0].start, self.player.y-window[1].start),
+            radius=radius,
             algorithm = tcod.constants.FOV_PERMISSIVE_7  #FOV_DIAMOND # or RESTRICTIVE,
         )
+        game_map.visible[window] = visible
+        game_map.fov_window = window
         # If a tile is "visible" it should be added to "explored".
-        self.game_map.explored |= self.game_map.visible
+        game_map.explored.union(window, visible)
 
     def get_fire_line(self, shooter: Actor) -> FireLine:
         if shooter == self.player:
@@ -266,10 +311,14 @@ class Engine:
         # self.message_log.render(console,X_info,18,X_info,6)
         self.message_log.render(console,0,23,79,1)
 
+    def snapshot(self, compress_floors: bool = True) -> save_file.Snapshot:
+        renderer, self.renderer = self.renderer, None # purge of context & console from engine
+        try:
+            return save_file.snapshot(self, compress_floors)
+        finally:
+            self.renderer = renderer
+
     def save_as(self, filename: str) -> None:
-        """Save this Engine instance as a compressed file."""
-        self.renderer = None # purge of context & console from engine
-        
-        save_data = lzma.compress(pickle.dumps(self))
-        with open(filename, "wb") as f:
-            f.write(save_data)
+        """Save this Engine instance, see `save_file`. The game can go on afterwards."""
+        self.autosave.wait()
+        save_file.write(self.snapshot(), filename)
@@ -4,7 +4,7 @@ import copy
 import math
 from typing import Optional, Tuple, Type, TypeVar, TYPE_CHECKING, Union
 
-from various_enum import ItemType, RenderOrder, SizeClass
+from various_enum import EffectType, ItemType, RenderOrder, SizeClass
 
 
 if TYPE_CHECKING:
@@ -79,13 +79,15 @@ class Entity:
         clone.y = y
         clone.parent = gamemap
         gamemap.entities.add(clone)
+        if isinstance(clone, Actor):
+            gamemap.actor_stats.attach(clone.fightable)
 
         # at init, place itself into the turnqueue
         if isinstance(self, Actor) or isinstance(self,Hazard):
             # current_time = 0
             # if gamemap.engine.turnqueue.heap:
             #     current_time = gamemap.engine.turnqueue.heap[0].time
-            gamemap.engine.turnqueue.schedule(0, clone)  
+            gamemap.schedule(clone)
 
         return clone
 
@@ -101,6 +103,8 @@ class Entity:
             #         self.gamemap.entities.remove(self)
             self.parent = gamemap
             gamemap.entities.add(self)
+            if isinstance(self, Actor):
+                gamemap.actor_stats.attach(self.fightable)
 
     def distance(self,x:int, y:int) -> float:
         """Chebyshev distance between player and x,y coordinates"""
@@ -115,6 +119,8 @@ class Entity:
     def remove (self) -> None:
         # je suppose que Gamemap est initialisé... cf les 3 lignes en commentaires hasattr...
         self.gamemap.entities.remove(self)
+        if isinstance(self, Actor):
+            self.gamemap.actor_stats.detach(self.fightable)
 
 
     def get_nearest_actor(self) -> Optional[Actor]:
@@ -181,6 +187,20 @@ class Actor(Entity):
         """Returns True as long as this actor can perform actions."""
         return bool(self.fightable.hp)
     
+    def add_effect(self, effect: EffectType, duration: int, **data) -> None:
+        """Start (or restart) an effect. Its duration is counted down by the engine clock."""
+        self.effects[effect.value] = {"duration": duration, **data}
+        self.fightable.set_effect_duration(effect, duration)
+
+    def sync_effects(self) -> None:
+        """Copy the durations counted down in the stats store into the effects dict and drop the ended effects."""
+        for key in list(self.effects):
+            duration = self.fightable.get_effect_duration(EffectType(key))
+            if duration <= 0:
+                del self.effects[key]
+            else:
+                self.effects[key]['duration'] = duration
+
     @property
     def see_actor(self) -> bool:
         return bool(set(self.gamemap.visible_actors)-{self})   
@@ -8,11 +8,13 @@ import line_types
 import tcod
 from entity import Actor, Entity
 from various_enum import ItemType, SizeClass
+import util.log as log
 
 if TYPE_CHECKING:
     from game_map import GameMap
     from engine import Engine
-    
+
+logger = log.get(log.COMBAT)
 
 MOVE_KEYS = {
     # Vi keys.
@@ -95,7 +97,7 @@ class FireLine:
     
         for [i, j] in reversed(fire_line[1:-1]):
             # check walls. 
-            if not self.parent.game_map.tiles["walkable"][i,j]:
+            if not self.parent.game_map.walkable[i,j]:
                 wall_cover_tmp += 1
 
         # if clear line of fire, we won't get better.
@@ -140,7 +142,7 @@ class FireLine:
             bend_y = self.shooter.y + dy
             
             # cannot bend into a wall
-            if not self.parent.game_map.tiles["walkable"][bend_x,bend_y]:
+            if not self.parent.game_map.walkable[bend_x,bend_y]:
                 continue
 
             fire_line = tcod.los.bresenham((bend_x,bend_y), self.target_xy).tolist()
@@ -148,7 +150,7 @@ class FireLine:
             wall_cover_tmp = 0
             for [i, j] in reversed(fire_line[1:-1]): 
                 # check if any wall is in between
-                if not self.parent.game_map.tiles["walkable"][i,j]:
+                if not self.parent.game_map.walkable[i,j]:
                     wall_cover_tmp += 1
 
             if wall_cover_tmp < wall_cover:
@@ -166,13 +168,13 @@ class FireLine:
         result = []
         skip_walls = True
         for [i, j] in self.path[:-1]:
-            if skip_walls and self.parent.game_map.tiles["walkable"][i,j]:
+            if skip_walls and self.parent.game_map.walkable[i,j]:
                 skip_walls = False
 
             entity = self.parent.game_map.get_target_at_location(i,j)
             if entity:
                 result.append(entity)
-            if not self.parent.game_map.tiles["walkable"][i,j]:
+            if not self.parent.game_map.walkable[i,j]:
                 if not skip_walls:
                     entity = self.parent.game_map.wall
                     result.append(entity)
@@ -181,7 +183,7 @@ class FireLine:
         #     entity = self.parent.game_map.get_target_at_location(i,j)
         #     if entity:
         #         result.append(entity)
-        #     if not self.parent.game_map.tiles["walkable"][i,j]:
+        #     if not self.parent.game_map.walkable[i,j]:
         #         entity = self.parent.game_map.wall
         #         result.append(entity)
 
@@ -221,7 +223,7 @@ class FireLine:
                 if target.is_actor and target.hunker_stack and len(self.path) > 1:
                     i,j = self.path[-2]
                     entity = self.parent.game_map.get_target_at_location(i,j)
-                    if not entity and not self.parent.game_map.tiles["walkable"][i,j]:
+                    if not entity and not self.parent.game_map.walkable[i,j]:
                         entity = self.parent.game_map.wall
                     if entity: 
                         cover+= target.hunker_stack*(entity.size.value + 1 - target_size)
@@ -234,7 +236,8 @@ class FireLine:
                     base_attack = max(0, base_attack)
                     if self.shooter.aim_stack:
                         base_attack += 3*self.shooter.aim_stack
-                        self.parent.logger.debug(f"Aim bonus: lvl{self.shooter.aim_stack}:{3*self.shooter.aim_stack}")
+                        if log.debug.combat:
+                            logger.debug("Aim bonus: lvl%s:%s", self.shooter.aim_stack, 3*self.shooter.aim_stack)
 
                 base_defense = target.fightable.defense
             cache = True
@@ -249,7 +252,8 @@ class FireLine:
             
         if not (self.shooter is self.parent.player and target is self.parent.player) and cache:
             self.combat_stat[self.shooter_xy+target_xy] = (base_attack, base_defense, cover)
-            self.parent.logger.debug(f"Combat_stat add cache : {(self.shooter_xy+target_xy)}:{self.combat_stat[(self.shooter_xy+target_xy)]}")
+            if log.debug.combat:
+                logger.debug("Combat_stat add cache : %s:%s", self.shooter_xy+target_xy, self.combat_stat[self.shooter_xy+target_xy])
 
         return (base_attack, base_defense, cover)
 
@@ -0,0 +1,103 @@
+"""Cold storage of the floors the player has left.
+
+A floor is frozen into one compressed blob : tiles as a uint8 tile id grid, transparency bit-packed, the rest
+of the GameMap (entities, parked tickets, explored layer, actor stats) pickled with its links to the engine cut.
+"""
+from __future__ import annotations
+
+import io
+import pickle
+import zlib
+from typing import NamedTuple, TYPE_CHECKING
+
+import numpy as np  # type: ignore
+
+import tile_types
+
+if TYPE_CHECKING:
+    from engine import Engine
+    from game_map import GameMap
+
+
+class FrozenFloor(NamedTuple):
+    width: int
+    height: int
+    blob: bytes
+
+
+class _FloorPickler(pickle.Pickler):
+    """Engine and player are referenced, not copied"""
+    def __init__(self, file: io.BytesIO, engine: Engine):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.engine = engine
+
+    def persistent_id(self, obj: object):
+        if obj is self.engine:
+            return "engine"
+        if obj is self.engine.player:
+            return "player"
+        return None
+
+
+class _FloorUnpickler(pickle.Unpickler):
+    def __init__(self, file: io.BytesIO, engine: Engine):
+        super().__init__(file)
+        self.engine = engine
+
+    def persistent_load(self, pid: str):
+        if pid == "engine":
+            return self.engine
+        if pid == "player":
+            return self.engine.player
+        raise pickle.UnpicklingError(f"Unknown reference {pid}")
+
+
+def _pack_bits(plane: np.ndarray) -> bytes:
+    return np.packbits(plane.ravel(order="F")).tobytes()
+
+
+def _unpack_bits(data: bytes, width: int, height: int) -> np.ndarray:
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8), count=width*height)
+    return bits.astype(bool).reshape((width, height), order="F")
+
+
+def freeze(game_map: GameMap) -> FrozenFloor:
+    """Return the compressed blob of a floor the player is not on (nothing is visible)."""
+    return compress(dump(game_map))
+
+
+def dump(game_map: GameMap) -> FrozenFloor:
+    """Frozen floor with a blob not compressed yet (see `compress`) : the floor is only read here,
+    compressing the blob may be done on another thread."""
+    planes = game_map.tiles, game_map.walkable, game_map.transparent, game_map.visible
+    record = {
+        "tiles": game_map.tiles.tobytes(order="F"),
+        "transparent": _pack_bits(game_map.transparent),
+    }
+
+    buffer = io.BytesIO()
+    game_map.tiles = game_map.walkable = game_map.transparent = game_map.visible = None
+    try:
+        _FloorPickler(buffer, game_map.engine).dump((game_map, record))
+    finally:
+        game_map.tiles, game_map.walkable, game_map.transparent, game_map.visible = planes
+
+    return FrozenFloor(game_map.width, game_map.height, buffer.getvalue())
+
+
+def compress(floor: FrozenFloor) -> FrozenFloor:
+    return floor._replace(blob=zlib.compress(floor.blob))
+
+
+def thaw(frozen: FrozenFloor, engine: Engine) -> GameMap:
+    """Rebuild the GameMap of a frozen floor."""
+    width, height = frozen.width, frozen.height
+    buffer = io.BytesIO(zlib.decompress(frozen.blob))
+    game_map, record = _FloorUnpickler(buffer, engine).load()
+
+    game_map.tiles = np.frombuffer(record["tiles"], dtype=np.uint8).reshape((width, height), order="F").copy(order="F")
+    game_map.walkable = np.asfortranarray(tile_types.registry["walkable"][game_map.tiles])
+    game_map.transparent = _unpack_bits(record["transparent"], width, height)
+    game_map.visible = np.full((width, height), fill_value=False, order="F")
+
+    return game_map
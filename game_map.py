@@ -1,13 +1,23 @@
 from __future__ import annotations
 
-from typing import Iterable, Iterator, List, Optional, Tuple, TYPE_CHECKING
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, TYPE_CHECKING
 # NamedTuple : https://stackoverflow.com/questions/2970608/what-are-named-tuples-in-python#2970722
 import numpy as np  # type: ignore
-import random
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 
 from entity import Actor, Entity, Feature, Hazard, Item
+from actor_stats import ActorStats
+from bitplane import BitPlane
+from chunks import MapChunks
+from hpa import TravelGraph
+import floor_storage
+from floor_storage import FrozenFloor
+from turnqueue import Ticket
 
 import tile_types
+import util.log as log
 
 if TYPE_CHECKING:
     from engine import Engine
@@ -21,10 +31,20 @@ class GameMap:
         self.branch = branch
         self.depth = depth
         self.entities = set(entities)
+        self.actor_stats = ActorStats()
+        for entity in self.entities:
+            if isinstance(entity, Actor):
+                self.actor_stats.attach(entity.fightable)
 
-        self.tiles = np.full((width, height), fill_value=tile_types.wall, order="F")
+        self.tiles = np.full((width, height), fill_value=tile_types.WALL, dtype=np.uint8, order="F") # Tile ids, see tile_types.registry
+        # Properties of `tiles`, kept as contiguous planes for FOV and pathfinding. Clouds also change `transparent`
+        self.walkable = np.full((width, height), fill_value=False, order="F")
+        self.transparent = np.full((width, height), fill_value=False, order="F")
         self.visible = np.full((width, height), fill_value=False, order="F") # Tiles the player can currently see
-        self.explored = np.full((width, height), fill_value=False, order="F") # Tiles the player has seen before
+        self.explored = BitPlane(width, height) # Tiles the player has seen before
+        self.chunks = MapChunks(width, height)
+        self.fov_window = self.chunks.window(0, 0, 0, 0) # only place where `visible` may be True
+        self.travel_graph = TravelGraph(self) # built at the first long travel
 
         self.upstairs_location =(0,0)
         self.downstairs_location =(0,0)
@@ -32,6 +52,12 @@ class GameMap:
         self.wall: Entity = None
         self.trails: List[Tuple[int, int]] = []
 
+        # turnqueue tickets of the entities, while the player is on another floor
+        self.parked: List[Ticket] = []
+        self.left_at = 0
+
+        self.generation_time = 0.0 # seconds, see GameWorld.generate_floor
+
     
     @property
     def gamemap(self) -> GameMap:
@@ -132,6 +158,22 @@ class GameMap:
         return None
 
 
+    def get_targets_in_mask(self, mask: np.ndarray, with_features: bool = True) -> List[Entity]:
+        """Return the living actors (and features) standing on a True cell of `mask`, in one indexed lookup."""
+        candidates = [
+            entity
+            for entity in self.entities
+            if (isinstance(entity, Actor) and entity.is_alive) or (with_features and isinstance(entity, Feature))
+        ]
+        if not candidates:
+            return candidates
+
+        xs = np.fromiter((entity.x for entity in candidates), dtype=np.intp, count=len(candidates))
+        ys = np.fromiter((entity.y for entity in candidates), dtype=np.intp, count=len(candidates))
+        hit = mask[xs, ys]
+
+        return [entity for entity, is_hit in zip(candidates, hit.tolist()) if is_hit]
+
     def get_blocking_entity_at_location(self, location_x: int, location_y: int) -> Optional[Entity]:
         for entity in self.entities:
             if entity.blocks_movement and entity.x == location_x and entity.y == location_y:
@@ -152,6 +194,44 @@ class GameMap:
             if isinstance(entity, Item) and entity.x == x and entity.y == y
         )
 
+    def paint(self, index, tile_id: int) -> None:
+        """Set the tiles at `index` (anything numpy can index with) to `tile_id`, with their properties."""
+        tile = tile_types.registry[tile_id]
+        self.tiles[index] = tile_id
+        self.walkable[index] = tile["walkable"]
+        self.transparent[index] = tile["transparent"]
+
+    def set_transparent(self, x: int, y: int, transparent: bool) -> None:
+        """Change the transparency of a tile of a live map (procgen may `paint` directly)."""
+        self.transparent[x, y] = transparent
+        self.chunks.mark_dirty(x, y)
+
+    def schedule(self, entity: Entity) -> None:
+        """Give a turn to a new entity : in the turnqueue if the player is on this map, else in the parked tickets"""
+        if self is getattr(self.engine, "game_map", None):
+            self.engine.turnqueue.schedule(0, entity)
+        else:
+            self.parked.append(Ticket(0, len(self.parked), entity))
+
+    def fast_forward(self, elapsed: int) -> None:
+        """Catch up, in one coarse step, the `elapsed` time spent while the player was on another floor.
+        Regen and effects are ticked for the whole floor at once, then each ai gets its own `fast_forward`.
+        """
+        turns = elapsed//60
+        if turns <= 0:
+            return
+
+        for slot in self.actor_stats.tick(turns).tolist():
+            self.actor_stats.owners[slot].parent.sync_effects()
+
+        for entity in list(self.entities):
+            ai = getattr(entity, "ai", None)
+            if ai and entity.is_alive:
+                ai.fast_forward(turns)
+
+        # vanished clouds and dead actors do not come back in the queue
+        self.parked = [ticket for ticket in self.parked if ticket.entity in self.entities]
+
     def in_bounds(self, x: int, y: int) -> bool:
         """Return True if x and y are inside of the bounds of this map."""
         return 0 <= x < self.width and 0 <= y < self.height
@@ -180,16 +260,12 @@ class GameMap:
         # world_slice, view_slice = self.camera.get_view_slice((self.width,self.height),(view_width,view_height))
         world_slice, view_slice = renderer.camera.get_view_slice((self.width,self.height),(view_width,view_height))
 
-        console.rgb[0:view_width, 0:view_height] = self.tiles["dark"][0:view_width, 0:view_height]
         console.rgb[0:view_width, 0:view_height] = tile_types.SHROUD
         
-        game_view = np.select(
-           condlist=[self.visible, self.explored],
-           choicelist=[self.tiles["light"], self.tiles["dark"]],
-           default=tile_types.SHROUD,
-        )
-
-        console.rgb[view_slice] = game_view[world_slice]
+        # only the part of the map in view : one gather in the graphics table, by display state and tile id
+        visible = self.visible[world_slice]
+        state = visible.astype(np.intp) + (visible | self.explored[world_slice])
+        console.rgb[view_slice] = np.take(tile_types.graphics.ravel(), state*len(tile_types.registry) + self.tiles[world_slice])
 
         entities_sorted_for_rendering = sorted(
             self.entities, key=lambda x: x.render_order.value, #reverse=True,
@@ -224,8 +300,8 @@ class GameWorld:
         max_rooms: int,
         room_min_size: int,
         room_max_size: int,
-        seed_init: int,
         current_floor: int = 0,
+        hot_floors: int = 3,
     ):
         self.engine = engine
 
@@ -239,47 +315,121 @@ class GameWorld:
 
         self.current_floor = current_floor
 
-        self.floors = {}
-        self.world_seed: int
-        self.floor_seeds = []
-
-        # Seed
-        if seed_init == -1:
-            self.world_seed = random.getrandbits(32)
-        else:
-            self.world_seed = seed_init
-
-        random.seed(a = self.world_seed)
-        for i in range(100):
-            self.floor_seeds.append(random.getrandbits(32))
-
-        random.seed()
-
-    def set_floor(self, depth: int, branch: str = "main") -> None:
-        """ initiate engine with the target level"""
+        # (branch, depth) : (GameMap or FrozenFloor, player_x, player_y), least recently left first
+        self.floors: OrderedDict = OrderedDict()
+        self.hot_floors = hot_floors # floors kept live in memory, the others are frozen
+        # records of live floors, from the last save or frozen ahead while idle (see save_file, idle),
+        # valid until the player enters them again
+        self.saved_floors: Dict[Tuple[str, int], FrozenFloor] = {}
+        self.world_seed = engine.rng.world_seed
+
+        # next floor, generated in background while the player is busy on the current one
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.next_floor: Optional[Tuple[Tuple[str, int], Future]] = None
+
+    def __getstate__(self) -> dict:
+        # threads can't be saved, the next floor will be generated again
+        state = self.__dict__.copy()
+        del state["executor"]
+        state["next_floor"] = None
+        state["saved_floors"] = {}
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def set_floor(self, depth: int, branch: Optional[str] = None) -> None:
+        """ initiate engine with the target level, in the branch of the current level by default"""
+        if branch is None:
+            branch = self.engine.game_map.branch
 
         # store current level in its state and player position & remove player from level that he is currently leaving
         if self.engine.turn_count != 0: # except at creation of a new game
-            self.floors[(branch,self.current_floor)] = (self.engine.game_map,self.engine.player.x,self.engine.player.y)
+            old_map = self.engine.game_map
+            self.floors[(old_map.branch,self.current_floor)] = (old_map,self.engine.player.x,self.engine.player.y)
+            self.floors.move_to_end((old_map.branch,self.current_floor))
             # clean previous status 
             self.engine.player.remove()
-            self.engine.game_map.visible[self.engine.game_map.visible == True] = False
+            old_map.visible[old_map.fov_window] = False
+            # entities left behind do not take turns anymore
+            old_map.parked = self.engine.turnqueue.park(old_map.entities)
+            old_map.left_at = self.engine.turnqueue.current_time
+            self.freeze_cold_floors()
 
         self.current_floor = depth
-
-        if (branch,depth) in list(self.floors):     
-            self.engine.game_map, player_x, player_y = self.floors[(branch,depth)]
+        # the floor will change : its last saved record is outdated
+        self.saved_floors.pop((branch,depth), None)
+
+        if (branch,depth) in self.floors:
+            # the floor is live again : stored back when the player leaves it
+            game_map, player_x, player_y = self.floors.pop((branch,depth))
+            if isinstance(game_map, FrozenFloor):
+                game_map = floor_storage.thaw(game_map, self.engine)
+                if log.debug.world:
+                    log.get(log.WORLD).debug("Floor %s:%s thawed", branch, depth)
+            self.engine.game_map = game_map
+            # catch up before the player arrives : the clock already ticked for the player on the other floor
+            elapsed = self.engine.turnqueue.current_time - self.engine.game_map.left_at
+            self.engine.game_map.fast_forward(elapsed)
+            self.engine.turnqueue.unpark(self.engine.game_map.parked, elapsed)
+            self.engine.game_map.parked = []
             self.engine.player.place(player_x, player_y, self.engine.game_map)
         else:
-            random.seed(self.floor_seeds.pop())
-            new_floor =  self.generate_floor(branch)
+            if self.next_floor and self.next_floor[0] == (branch,depth):
+                new_floor = self.next_floor[1].result()
+            else:
+                new_floor = self.generate_floor(branch, depth)
+            self.next_floor = None
+            log.get(log.WORLD).info("Floor %s:%s generated in %.1f ms", branch, depth, new_floor.generation_time*1000)
             self.engine.game_map = new_floor
-            random.seed()
-
-    def generate_floor(self, branch: str = "main") -> GameMap:
-        from procgen import generate_dungeon
-        
-        return generate_dungeon(
+            self.engine.player.place(*new_floor.upstairs_location, new_floor)
+            self.engine.turnqueue.unpark(new_floor.parked)
+            new_floor.parked = []
+
+        self.prepare_next_floor(branch, depth+1)
+        self.engine.autosave.request()
+
+    def prepare_next_floor(self, branch: str, depth: int) -> None:
+        """Start generating the floor below, unless already known"""
+        if (branch,depth) in self.floors:
+            return
+        if self.next_floor and self.next_floor[0] == (branch,depth):
+            return
+        self.next_floor = ((branch,depth), self.executor.submit(self.generate_floor, branch, depth))
+        if log.debug.world:
+            log.get(log.WORLD).debug("Floor %s:%s generation started in background", branch, depth)
+
+    def record_left_floor(self) -> bool:
+        """Freeze the record of one live floor left by the player, ahead of the next save or freeze.
+        Return True once they all have one."""
+        for key, (game_map, _, _) in self.floors.items():
+            if not isinstance(game_map, FrozenFloor) and key not in self.saved_floors:
+                self.saved_floors[key] = floor_storage.freeze(game_map)
+                if log.debug.world:
+                    log.get(log.WORLD).debug("Floor %s:%s recorded while idle", *key)
+                return False
+        return True
+
+    def freeze_cold_floors(self) -> None:
+        """Keep live only the `hot_floors` floors most recently left, freeze the others."""
+        hot = [key for key, (game_map, _, _) in self.floors.items() if not isinstance(game_map, FrozenFloor)]
+        for key in hot[:max(0, len(hot)-self.hot_floors)]:
+            game_map, player_x, player_y = self.floors[key]
+            # unchanged since the last save : its record is already the frozen floor
+            frozen = self.saved_floors.pop(key, None) or floor_storage.freeze(game_map)
+            self.floors[key] = (frozen, player_x, player_y)
+            if log.debug.world:
+                log.get(log.WORLD).debug("Floor %s:%s frozen", *key)
+
+    def generate_floor(self, branch: str, depth: int) -> GameMap:
+        """Generate a floor with the generator of its branch, from its own random stream :
+        the result does not depend on when it is generated."""
+        from procgen import generate_dungeon, generators
+
+        generator = generators.get(branch, generate_dungeon)
+        start = time.perf_counter()
+        new_floor = generator(
             max_rooms=self.max_rooms,
             room_min_size=self.room_min_size,
             room_max_size=self.room_max_size,
@@ -287,6 +437,10 @@ class GameWorld:
             map_height=self.map_height,
             engine=self.engine,
             branch=branch,
-            depth=self.current_floor,
+            depth=depth,
+            rng=self.engine.rng.floor(branch, depth),
         )
+        new_floor.generation_time = time.perf_counter() - start
+
+        return new_floor
 
@@ -0,0 +1,251 @@
+"""Hierarchical pathfinding (HPA*) for long travels on a floor.
+
+Each chunk of the map (see `chunks`) is a cluster. Where two neighbour clusters share a run of walkable tiles along
+their border, the middle of the run is an entrance : a pair of nodes, one on each side. Inside a cluster,
+every pair of nodes is linked with its walking cost. A query runs A* on this small graph, then each step is
+refined by a pathfinder limited to one cluster, when the traveller gets there. The graph of a cluster is rebuilt only when the revision of
+its chunk (or a neighbour) changes, at the first query after the change or ahead of it, a few clusters at a time,
+while the game waits for the player (see `idle`).
+"""
+from __future__ import annotations
+
+import heapq
+from typing import Dict, Iterator, List, Optional, Set, Tuple, TYPE_CHECKING
+
+import numpy as np  # type: ignore
+import tcod
+
+from chunks import Window
+
+if TYPE_CHECKING:
+    from game_map import GameMap
+
+Node = Tuple[int, int]
+Cluster = Tuple[int, int]
+Border = Tuple[Cluster, Cluster]
+
+CARDINAL, DIAGONAL = 2, 3 # same costs as the other pathfinders
+UNREACHABLE = np.iinfo(np.int32).max
+
+
+def estimate(a: Node, b: Node) -> int:
+    """Cost of the shortest walk between two tiles on an empty map"""
+    dx, dy = abs(a[0]-b[0]), abs(a[1]-b[1])
+    return CARDINAL*max(dx, dy) + (DIAGONAL-CARDINAL)*min(dx, dy)
+
+
+class TravelGraph:
+    def __init__(self, game_map: GameMap):
+        self.game_map = game_map
+        self.reset()
+
+    def reset(self) -> None:
+        self.revisions: Optional[np.ndarray] = None # chunk revisions of the last refresh, None = never built
+        self.entrances: Dict[Border, Dict[Node, Node]] = {} # node : node on the other side
+        self.edges: Dict[Cluster, Dict[Node, Dict[Node, int]]] = {} # intra-cluster costs between nodes
+        # refresh in progress : what is left to rebuild, and the revisions it brings the graph to
+        self.pending_borders: Set[Border] = set()
+        self.pending_clusters: Set[Cluster] = set()
+        self.pending_revisions: Optional[np.ndarray] = None
+
+    def __getstate__(self) -> dict:
+        # cheap to rebuild, not worth saving
+        return {"game_map": self.game_map}
+
+    def __setstate__(self, state: dict) -> None:
+        self.game_map = state["game_map"]
+        self.reset()
+
+    @property
+    def walkable(self) -> np.ndarray:
+        return self.game_map.walkable
+
+    def cluster_of(self, node: Node) -> Cluster:
+        return self.game_map.chunks.chunk_of(*node)
+
+    def borders_of(self, cluster: Cluster) -> Iterator[Border]:
+        cx, cy = cluster
+        width, height = self.game_map.chunks.shape
+        if cx > 0:
+            yield ((cx-1, cy), cluster)
+        if cx < width-1:
+            yield (cluster, (cx+1, cy))
+        if cy > 0:
+            yield ((cx, cy-1), cluster)
+        if cy < height-1:
+            yield (cluster, (cx, cy+1))
+
+    def nodes_of(self, cluster: Cluster) -> Set[Node]:
+        return {
+            node
+            for border in self.borders_of(cluster)
+            for node in self.entrances.get(border, {})
+            if self.cluster_of(node) == cluster
+        }
+
+    def refresh(self, budget: Optional[int] = None) -> bool:
+        """Rebuild the clusters whose chunk changed since the last refresh, with their neighbours.
+        With a `budget`, stop after rebuilding that many borders and clusters : the next call goes on.
+        Return True once the graph is up to date."""
+        while True:
+            if self.pending_revisions is None:
+                if self.revisions is None:
+                    self.revisions = np.full(self.game_map.chunks.shape, -1, dtype=np.int32, order="F")
+                changed = np.argwhere(self.game_map.chunks.revisions != self.revisions).tolist()
+                if not changed:
+                    return True
+                # chunks changed while the refresh is in progress differ from these revisions : rebuilt after
+                self.pending_revisions = self.game_map.chunks.revisions.copy(order="F")
+                self.pending_borders = {border for cx, cy in changed for border in self.borders_of((cx, cy))}
+                self.pending_clusters = {(cx, cy) for cx, cy in changed}
+                for border in self.pending_borders:
+                    self.pending_clusters.update(border)
+
+            # entrances first : the nodes of a cluster come from its borders
+            while self.pending_borders or self.pending_clusters:
+                if budget is not None:
+                    if budget <= 0:
+                        return False
+                    budget -= 1
+                if self.pending_borders:
+                    border = self.pending_borders.pop()
+                    self.entrances[border] = self.find_entrances(border)
+                else:
+                    cluster = self.pending_clusters.pop()
+                    self.edges[cluster] = self.link_nodes(cluster, self.nodes_of(cluster))
+
+            self.revisions, self.pending_revisions = self.pending_revisions, None
+
+    def find_entrances(self, border: Border) -> Dict[Node, Node]:
+        """One entrance in the middle of each run of tiles walkable on both sides of the border."""
+        (ax, ay), (bx, by) = border
+        window_a = self.game_map.chunks.chunk_window(ax, ay)
+        if bx != ax:
+            # vertical border : last column of a, first column of b
+            x = window_a[0].stop-1
+            ys = np.arange(window_a[1].start, window_a[1].stop)
+            open_tiles = self.walkable[x, ys] & self.walkable[x+1, ys]
+            sides = lambda i: ((x, int(ys[i])), (x+1, int(ys[i])))
+        else:
+            y = window_a[1].stop-1
+            xs = np.arange(window_a[0].start, window_a[0].stop)
+            open_tiles = self.walkable[xs, y] & self.walkable[xs, y+1]
+            sides = lambda i: ((int(xs[i]), y), (int(xs[i]), y+1))
+
+        # runs of True : starts and ends from the changes of the padded mask
+        changes = np.flatnonzero(np.diff(np.concatenate(([0], open_tiles.astype(np.int8), [0]))))
+        entrances: Dict[Node, Node] = {}
+        for start, stop in zip(changes[::2].tolist(), changes[1::2].tolist()):
+            a, b = sides((start+stop-1)//2)
+            entrances[a] = b
+            entrances[b] = a
+
+        return entrances
+
+    def distances_from(self, node: Node, window: Window) -> np.ndarray:
+        """Walking cost from `node` to each tile of the window"""
+        cost = self.walkable[window].astype(np.int8)
+        dist = tcod.path.maxarray(cost.shape, dtype=np.int32, order="F")
+        dist[node[0]-window[0].start, node[1]-window[1].start] = 0
+        tcod.path.dijkstra2d(dist, cost, CARDINAL, DIAGONAL, out=dist)
+        return dist
+
+    def link_nodes(self, cluster: Cluster, nodes: Set[Node]) -> Dict[Node, Dict[Node, int]]:
+        """Walking costs between the nodes of a cluster, without leaving it."""
+        window = self.game_map.chunks.chunk_window(*cluster)
+        edges: Dict[Node, Dict[Node, int]] = {node: {} for node in nodes}
+        for node in nodes:
+            dist = self.distances_from(node, window)
+            for other in nodes:
+                cost = int(dist[other[0]-window[0].start, other[1]-window[1].start])
+                if other != node and cost != UNREACHABLE:
+                    edges[node][other] = cost
+        return edges
+
+    def local_path(self, start: Node, goal: Node, window: Window) -> List[List[int]]:
+        """Path from start (excluded) to goal inside the window, empty if none."""
+        left, top = window[0].start, window[1].start
+        graph = tcod.path.SimpleGraph(cost=self.walkable[window].astype(np.int8), cardinal=CARDINAL, diagonal=DIAGONAL)
+        pathfinder = tcod.path.Pathfinder(graph)
+        pathfinder.add_root((start[0]-left, start[1]-top))
+        path = pathfinder.path_to((goal[0]-left, goal[1]-top))[1:] + (left, top)
+        return path.tolist()
+
+    def find_waypoints(self, start: Node, goal: Node) -> List[Node]:
+        """Waypoints from start to goal (both included), empty if there is no path.
+        Near goals are reached directly, far ones through the cluster graph.
+        Each leg is turned into tiles by `refine`."""
+        if start == goal or not self.walkable[goal]:
+            return []
+
+        start_cluster, goal_cluster = self.cluster_of(start), self.cluster_of(goal)
+        if max(abs(start_cluster[0]-goal_cluster[0]), abs(start_cluster[1]-goal_cluster[1])) <= 1:
+            if self.refine(start, goal):
+                return [start, goal]
+
+        self.refresh()
+        return self.search(start, goal)
+
+    def refine(self, a: Node, b: Node) -> List[List[int]]:
+        """Tiles from waypoint a (excluded) to waypoint b"""
+        if self.cluster_of(a) != self.cluster_of(b) and max(abs(a[0]-b[0]), abs(a[1]-b[1])) == 1:
+            return [list(b)] # entrance crossing
+        return self.local_path(a, b, self.game_map.chunks.window(*a, *b))
+
+    def find_path(self, start: Node, goal: Node) -> List[List[int]]:
+        """Whole path from start (excluded) to goal, empty if there is none"""
+        waypoints = self.find_waypoints(start, goal)
+        return [tile for a, b in zip(waypoints, waypoints[1:]) for tile in self.refine(a, b)]
+
+    def search(self, start: Node, goal: Node) -> List[Node]:
+        """A* on the cluster graph, with start and goal linked to the nodes of their cluster."""
+        start_cluster, goal_cluster = self.cluster_of(start), self.cluster_of(goal)
+
+        window = self.game_map.chunks.chunk_window(*start_cluster)
+        dist = self.distances_from(start, window)
+        start_edges = {
+            node: int(dist[node[0]-window[0].start, node[1]-window[1].start])
+            for node in self.edges.get(start_cluster, {})
+        }
+        window = self.game_map.chunks.chunk_window(*goal_cluster)
+        dist = self.distances_from(goal, window)
+        goal_edges = {
+            node: int(dist[node[0]-window[0].start, node[1]-window[1].start])
+            for node in self.edges.get(goal_cluster, {})
+        }
+        if start_cluster == goal_cluster and dist[start[0]-window[0].start, start[1]-window[1].start] != UNREACHABLE:
+            start_edges[goal] = int(dist[start[0]-window[0].start, start[1]-window[1].start])
+
+        costs: Dict[Node, int] = {start: 0}
+        came_from: Dict[Node, Node] = {}
+        heap: List[Tuple[int, int, Node]] = [(estimate(start, goal), 0, start)]
+        while heap:
+            _, cost, node = heapq.heappop(heap)
+            if node == goal:
+                steps = [goal]
+                while steps[-1] != start:
+                    steps.append(came_from[steps[-1]])
+                return steps[::-1]
+            if cost > costs[node]:
+                continue
+            for neighbour, step_cost in self.neighbours(node, start, start_edges, goal, goal_edges):
+                if step_cost == UNREACHABLE:
+                    continue
+                new_cost = cost + step_cost
+                if new_cost < costs.get(neighbour, UNREACHABLE):
+                    costs[neighbour] = new_cost
+                    came_from[neighbour] = node
+                    heapq.heappush(heap, (new_cost + estimate(neighbour, goal), new_cost, neighbour))
+        return []
+
+    def neighbours(self, node: Node, start: Node, start_edges: Dict[Node, int], goal: Node, goal_edges: Dict[Node, int]) -> Iterator[Tuple[Node, int]]:
+        if node == start:
+            yield from start_edges.items()
+        cluster = self.cluster_of(node)
+        yield from self.edges.get(cluster, {}).get(node, {}).items()
+        for border in self.borders_of(cluster):
+            other = self.entrances.get(border, {}).get(node)
+            if other:
+                yield other, CARDINAL
+        if node in goal_edges:
+            yield goal, goal_edges[node]
@@ -0,0 +1,42 @@
+"""Background work done while the game waits for the player.
+
+Before blocking on the keyboard, the turn loop lets `IdleScheduler` run small jobs, one step at a time, checking
+for a key between steps. A key stops the work at once (it stays queued in the input buffer), the jobs go on at the
+next wait : the player feels at most the latency of one step.
+"""
+from __future__ import annotations
+
+from typing import Callable, List, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from engine import Engine
+
+
+class IdleScheduler:
+    def __init__(self, engine: Engine, travel_budget: int = 4):
+        self.engine = engine
+        self.travel_budget = travel_budget # borders and clusters of the travel graph rebuilt per step
+
+    def jobs(self) -> List[Callable[[], bool]]:
+        """Most urgent first. Each call does one step, and returns True when the job has nothing left to do.
+        Left floors are recorded before the autosave, which then reuses their records."""
+        return [self.engine.game_world.record_left_floor, self.autosave, self.warm_travel_graph]
+
+    def run(self) -> None:
+        """Run the jobs until they are all done or a key is typed"""
+        input_buffer = self.engine.input_buffer
+        for job in self.jobs():
+            done = False
+            while not done:
+                if input_buffer.poll():
+                    return
+                done = job()
+
+    def autosave(self) -> bool:
+        # the game waits for the player : same state as a save on quit
+        self.engine.autosave.check()
+        return True
+
+    def warm_travel_graph(self) -> bool:
+        """Bring the graph of long travels up to date before the next travel asks for it"""
+        return self.engine.game_map.travel_graph.refresh(budget=self.travel_budget)
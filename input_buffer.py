@@ -0,0 +1,94 @@
+"""Keys typed ahead, played without rendering in between.
+
+When keys come faster than the game renders (a held movement key, fast typing over SSH), the turn loop plays the
+queued keys one after the other, enemy turns included, and renders once they are all played. A render is still
+forced every `uv.input_batch` keys, and the keys left are dropped when the player should look at the screen
+first : a hostile came into view, or the player was hurt.
+Other events drained meanwhile (window resized or closed...) are kept in order with the keys.
+"""
+from __future__ import annotations
+
+from collections import deque
+from typing import Deque, Iterable, Set, TYPE_CHECKING
+
+import numpy as np  # type: ignore
+import tcod
+
+import util.event
+import util.var_global as uv
+from input_handlers import MainGameEventHandler
+
+if TYPE_CHECKING:
+    from engine import Engine
+    from entity import Actor
+    from input_handlers import BaseEventHandler
+
+# events the turn loop acts upon
+HANDLED_EVENTS = (tcod.event.KeyDown, tcod.event.Quit, tcod.event.WindowResized)
+
+
+class InputBuffer:
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.reset()
+
+    def reset(self) -> None:
+        self.events_queue: Deque[tcod.event.Event] = deque()
+        self.played = 0 # keys played since the last render
+        self.hostiles: Set[Actor] = set() # in view at the last render
+        self.hp = 0 # of the player at the last render
+
+    def __getstate__(self) -> dict:
+        # events belong to the running game
+        return {"engine": self.engine}
+
+    def __setstate__(self, state: dict) -> None:
+        self.engine = state["engine"]
+        self.reset()
+
+    def rendered(self) -> None:
+        """The player sees the game as it is now"""
+        self.played = 0
+        self.hostiles = self.visible_hostiles()
+        self.hp = self.engine.player.fightable.hp
+
+    def can_skip_render(self, handler: BaseEventHandler) -> bool:
+        """True if a queued key can be played before rendering. Menus, and a resized or closed window, are always rendered."""
+        if uv.input_batch <= 0 or self.played >= uv.input_batch or not isinstance(handler, MainGameEventHandler):
+            return False
+        self.poll()
+        if not any(isinstance(event, tcod.event.KeyDown) for event in self.events_queue):
+            return False
+        if any(isinstance(event, (tcod.event.Quit, tcod.event.WindowResized)) for event in self.events_queue):
+            return False
+        if self.interrupted():
+            self.events_queue = deque(event for event in self.events_queue if not isinstance(event, tcod.event.KeyDown))
+            return False
+        return True
+
+    def poll(self) -> bool:
+        """Queue the events received so far, True if the turn loop has one to act upon (see HANDLED_EVENTS)"""
+        self.events_queue.extend(util.event.pending())
+        return any(isinstance(event, HANDLED_EVENTS) for event in self.events_queue)
+
+    def events(self) -> Iterable[tcod.event.Event]:
+        """The next queued event, else wait for the next events"""
+        if self.events_queue:
+            event = self.events_queue.popleft()
+            if isinstance(event, tcod.event.KeyDown):
+                self.played += 1
+            return [event]
+        return util.event.wait()
+
+    def interrupted(self) -> bool:
+        player = self.engine.player
+        return not player.is_alive or player.fightable.hp < self.hp or not self.visible_hostiles() <= self.hostiles
+
+    def visible_hostiles(self) -> Set[Actor]:
+        game_map = self.engine.game_map
+        actors = [actor for actor in game_map.actors if actor is not self.engine.player]
+        if not actors:
+            return set()
+        xs = np.fromiter((actor.x for actor in actors), dtype=np.intp, count=len(actors))
+        ys = np.fromiter((actor.y for actor in actors), dtype=np.intp, count=len(actors))
+        return {actor for actor, seen in zip(actors, game_map.visible[xs, ys].tolist()) if seen}
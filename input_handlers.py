@@ -2,6 +2,8 @@ from __future__ import annotations
 import os
 import time
 
+import numpy as np
+
 from typing import Callable, List, Optional, Tuple, TYPE_CHECKING, Union
 
 import tcod.event
@@ -12,6 +14,7 @@ from actions import (Action, BumpAction, WaitAction)
 
 import color
 import exceptions
+import tile_types
 import components.ai
 import util.calc_functions as cf
 
@@ -519,7 +522,7 @@ class SingleRangedAttackHandler(SelectIndexHandler):
 
             lof = self.engine.player_lof
             for [i, j] in lof.path: 
-                if self.engine.game_map.tiles["light"]["ch"][i,j] == ord("#"):
+                if self.engine.game_map.tiles[i,j] == tile_types.WALL:
                     console.rgb["bg"][renderer.shift(i,j)] = color.gray
                     console.rgb["fg"][renderer.shift(i,j)] = color.white
                 elif self.engine.game_map.get_target_at_location(i, j):
@@ -593,7 +596,7 @@ class AreaRangedAttackHandler(SelectIndexHandler):
             lof = self.engine.player_lof
 
             for [i, j] in lof.path:
-                if self.engine.game_map.tiles["light"]["ch"][i,j] == ord("#"):
+                if self.engine.game_map.tiles[i,j] == tile_types.WALL:
                     console.rgb["bg"][renderer.shift(i,j)] = color.gray
                     console.rgb["fg"][renderer.shift(i,j)] = color.white
                 elif self.engine.game_map.get_target_at_location(i, j):
@@ -605,7 +608,7 @@ class AreaRangedAttackHandler(SelectIndexHandler):
             
             # explosion take place just before the wall
             x,y = self.x,self.y
-            if not self.engine.game_map.tiles["walkable"][x,y]:
+            if not self.engine.game_map.walkable[x,y]:
                 if len(lof.path) > 1:
                     x,y = lof.path[-2]
                 else:
@@ -618,7 +621,7 @@ class AreaRangedAttackHandler(SelectIndexHandler):
                             console.rgb["bg"][renderer.shift(x+i,y+j)] = color.n_gray
                             console.rgb["fg"][renderer.shift(x+i,y+j)] = color.white
                         else:
-                            if self.engine.game_map.tiles["walkable"][x+i,y+j]:
+                            if self.engine.game_map.walkable[x+i,y+j]:
                                 console.rgb["fg"][renderer.shift(x+i,y+j)] = color.n_gray
                                 console.rgb["ch"][renderer.shift(x+i,y+j)] = ord("*")
                     else:
@@ -693,19 +696,21 @@ class ConeRangedAttackHandler(SelectIndexHandler):
             console.rgb["fg"][renderer.shift(*lof.shooter_xy)] = color.white
             return
                     
-        target_area=cf.get_cone_points(start=lof.shooter_xy,end=lof.target_xy,cone_radius=self.cone,dist=5)
-        for point in target_area:
-            if not self.engine.game_map.in_bounds(*point):
-                continue
-            if self.engine.game_map.visible[point[0],point[1]] and cf.get_distance(lof.shooter_xy,point) <= 10:
-                if self.engine.game_map.tiles["light"]["ch"][point[0],point[1]] == ord("#"):
-                    pass
-                elif self.engine.game_map.get_target_at_location(*point):
-                    console.rgb["bg"][renderer.shift(*point)] = self.get_bcolor(lof.shooter_xy,point)
-                    console.rgb["fg"][renderer.shift(*point)] = self.get_fcolor(lof.shooter_xy,point)
-                else:
-                    console.rgb["fg"][renderer.shift(*point)] = self.get_bcolor(lof.shooter_xy,point)
-                    console.rgb["ch"][renderer.shift(*point)] = ord("*")
+        game_map = self.engine.game_map
+        target_area = cf.get_cone_mask(start=lof.shooter_xy, end=lof.target_xy, cone_radius=self.cone, shape=(game_map.width, game_map.height))
+        # visible and not a wall
+        target_area &= game_map.visible
+        target_area &= game_map.tiles != tile_types.WALL
+        xs, ys = np.nonzero(target_area)
+        in_range = np.hypot(xs - lof.shooter_xy[0], ys - lof.shooter_xy[1]) <= 10
+
+        for point in zip(xs[in_range].tolist(), ys[in_range].tolist()):
+            if game_map.get_target_at_location(*point):
+                console.rgb["bg"][renderer.shift(*point)] = self.get_bcolor(lof.shooter_xy,point)
+                console.rgb["fg"][renderer.shift(*point)] = self.get_fcolor(lof.shooter_xy,point)
+            else:
+                console.rgb["fg"][renderer.shift(*point)] = self.get_bcolor(lof.shooter_xy,point)
+                console.rgb["ch"][renderer.shift(*point)] = ord("*")
 
     def get_bcolor(self,start: Tuple[int,int], end: Tuple[int,int]) -> Tuple[int,int,int]:
         if cf.get_distance(start, end) < 3:
@@ -806,6 +811,7 @@ class MainGameEventHandler(EventHandler):
 class GameOverEventHandler(EventHandler):
     def on_quit(self) -> None:
         """Handle exiting out of a finished game."""
+        self.engine.autosave.wait()
         if os.path.exists("savegame.sav"):
             os.remove("savegame.sav")  # Deletes the active save file.
         raise exceptions.QuitWithoutSaving()  # Avoid saving a finished game.
@@ -844,7 +850,8 @@ class HistoryViewer(EventHandler):
             1,
             log_console.width - 2,
             log_console.height - 2,
-            self.engine.message_log.messages[: self.cursor + 1],
+            self.engine.message_log.messages,
+            skip=self.log_length - 1 - self.cursor,
         )
         log_console.blit(console, 3, 3)
 
@@ -9,12 +9,15 @@ import curses
 
 import util.var_global
 import util.event
+import util.log
 from util.charmap import CHARMAP_CP437_pepito
 
 import exceptions
 import input_handlers
 
 import color
+import procgen
+import save_file
 import setup_game
 from engine import Engine
 from input_handlers import GameOverEventHandler
@@ -57,26 +60,20 @@ def main(stdscr) -> None:
 
 
 
-    # technical log tool
-    logger = logging.getLogger('tech_logger')
-    logger_handler = logging.FileHandler(filename="logfile.log",mode="w")
-    logger_handler.setFormatter(fmt=logging.Formatter(fmt="%(levelname)s %(asctime)s - %(message)s"))
-    logger.addHandler(logger_handler)
-    logger.setLevel(logging.DEBUG)
-
-    # util.var_global.logger = logger
-
-    # game message log tool
-    gamelog = logging.getLogger('game_logger')
-    gamelog_handler = logging.FileHandler(filename="game.log",mode="w")
-    gamelog.addHandler(gamelog_handler)
-    gamelog.setLevel(logging.DEBUG)
+    # technical and game logs, written by a background thread
+    util.log.setup(debug_subsystems=config['debug'] or ())
+    logger = logging.getLogger(util.log.TECH_LOGGER)
+    gamelog = logging.getLogger(util.log.GAME_LOGGER)
 
     logger.info(f"Command line parameters: {config}")
 
 
     util.var_global.seed_init = config['seed']
     util.var_global.instant_travel = config['instant_travel']
+    util.var_global.autosave_turns = config['autosave']
+    util.var_global.save_codec = config['codec']
+    util.var_global.input_batch = config['input_batch']
+    util.var_global.start_branch = config['branch']
 
     handler: input_handlers.BaseEventHandler = setup_game.MainMenu() # gets back with MainGameEventHandler
 
@@ -138,10 +135,14 @@ def main(stdscr) -> None:
 
     try:
         while True:
+            if engine_ok and engine.window_resized:
+                engine.window_resized = False
+                resize = True
             if resize:
                 resize = False
                 size = renderer.context.recommended_console_size()
-                logger.debug(f"context cols={size[0]} lines={size[1]}")
+                if util.log.debug.engine:
+                    util.log.get(util.log.ENGINE).debug("context cols=%s lines=%s", size[0], size[1])
                 renderer.view_width=size[0]-41
                 if renderer.view_width//2 == renderer.view_width/2:
                     renderer.view_width -= 1
@@ -153,7 +154,8 @@ def main(stdscr) -> None:
 
                 # renderer.view_width=size[0]-40
                 # renderer.view_height=size[1]-1
-                logger.debug(f"width={renderer.view_width} height={renderer.view_height}")
+                if util.log.debug.engine:
+                    util.log.get(util.log.ENGINE).debug("width=%s height=%s", renderer.view_width, renderer.view_height)
                 if size[0] <screen_width or size[1] < screen_height:
                     print("Min size of console is 80x24.")
                     raise SystemExit
@@ -213,10 +215,25 @@ parser.add_argument('-s', '--seed', type=int, help='fixed seed for static genera
 parser.add_argument('-t', '--tiles', dest='png' , type=str, help="path to a specific PNG tiles file (charmap CP437)")
 parser.add_argument('-w', '--wizard', action='store_true', help='start in wizard mode')
 parser.add_argument('-i', '--instant_travel', action='store_true', help='switch to instant travel with trails')
+parser.add_argument('-a', '--autosave', type=int, default=100, metavar='TURNS', help='autosave every TURNS turns and at each floor change, 0 to disable (default 100)')
+parser.add_argument('-b', '--input-batch', type=int, default=8, metavar='KEYS', help='play up to KEYS typed ahead keys before rendering again, 0 to render after each key (default 8)')
+parser.add_argument('--branch', choices=list(procgen.generators), default=util.var_global.start_branch, metavar='BRANCH', help=f"branch of the dungeon a new game starts in ({', '.join(procgen.generators)}, default %(default)s)")
+parser.add_argument('-d', '--debug', action='append', choices=util.log.SUBSYSTEMS, metavar='SUBSYSTEM', help=f"log the debug messages of a subsystem ({', '.join(util.log.SUBSYSTEMS)}), can be repeated")
+parser.add_argument('--codec', choices=save_file.CODECS, default=util.var_global.save_codec, metavar='CODEC', help='compression of the save files : none, zlib-1..9, bz2-1..9 or lzma-0..9 (default %(default)s)')
+parser.add_argument('--benchmark-save', nargs='?', const='savegame.sav', metavar='FILE', help='compare the save codecs on a save (default savegame.sav) and quit')
 args = parser.parse_args()
 config = vars(args)
 
+def benchmark_save(filename: str) -> None:
+    print(f"{'codec':8} {'size (B)':>10} {'compress (ms)':>14} {'decompress (ms)':>16}")
+    for name, size, compress_time, decompress_time in save_file.benchmark(filename):
+        print(f"{name:8} {size:10d} {compress_time*1000:14.1f} {decompress_time*1000:16.1f}")
+
 if __name__ == "__main__":
+    if config['benchmark_save']:
+        benchmark_save(config['benchmark_save'])
+        raise SystemExit
+
     if config['wizard']:
         print("wizard: Not yet implemented")
 
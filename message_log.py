@@ -1,4 +1,6 @@
-from typing import List, Reversible, Tuple, Iterable
+from collections import deque
+from itertools import islice
+from typing import Deque, Dict, List, Reversible, Tuple, Iterable
 import textwrap
 
 import tcod
@@ -11,6 +13,12 @@ class Message:
         self.plain_text = text
         self.fg = fg
         self.count = 1
+        self.wrap_cache: Dict[int, Tuple[int, List[str]]] = {} # width : (count, lines)
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state["wrap_cache"] = {}
+        return state
 
     @property
     def full_text(self) -> str:
@@ -19,14 +27,20 @@ class Message:
             return f"{self.plain_text} (x{self.count})"
         return self.plain_text
 
+    def wrapped(self, width: int) -> List[str]:
+        """Lines of the full text wrapped to `width`, computed again only when the count changes."""
+        count, lines = self.wrap_cache.get(width, (0, []))
+        if count != self.count:
+            lines = list(MessageLog.wrap(self.full_text, width))
+            self.wrap_cache[width] = (self.count, lines)
+        return lines
+
 
 class MessageLog:
-    def __init__(self) -> None:
-        self.messages: List[Message] = []
-        self.gamelog: logging.Logger = logging.getLogger('game_logger')
-        gamelog_handler = logging.FileHandler(filename="game.log",mode="w")
-        self.gamelog.addHandler(gamelog_handler)
-        self.gamelog.setLevel(logging.DEBUG)
+    def __init__(self, capacity: int = 1000) -> None:
+        # the last `capacity` messages, older ones are only kept in the game log (see add_message)
+        self.messages: Deque[Message] = deque(maxlen=capacity)
+        self.gamelog: logging.Logger = logging.getLogger('game_logger') # handlers installed by util.log.setup
 
 
     def add_message(
@@ -43,7 +57,8 @@ class MessageLog:
             self.messages.append(Message(text, fg))
         
         # self.gamelog.info("\033["+33;1+"m"+self.messages[-1].full_text+"\033[0m")
-        self.gamelog.info("\033["+color._colorToANSI.get(fg)+"m"+self.messages[-1].full_text+"\033[0m")
+        if self.gamelog.isEnabledFor(logging.INFO):
+            self.gamelog.info("\033["+color._colorToANSI.get(fg)+"m"+self.messages[-1].full_text+"\033[0m")
 
 
     def render(
@@ -71,15 +86,16 @@ class MessageLog:
         width: int,
         height: int,
         messages: Reversible[Message],
+        skip: int = 0,
     ) -> None:
         """Render the messages provided.
-        The `messages` are rendered starting at the last message and working
-        backwards.
+        The `messages` are rendered starting at the last message (but the `skip` last ones) and working
+        backwards, until the area is full.
         """
         y_offset = height - 1
 
-        for message in reversed(messages):
-            for line in reversed(list(cls.wrap(message.full_text, width))):
+        for message in islice(reversed(messages), skip, None):
+            for line in reversed(message.wrapped(width)):
                 console.print(x=x, y=y + y_offset, string=line, fg=message.fg)
                 y_offset -= 1
                 if y_offset < 0:
@@ -1,8 +1,9 @@
 from __future__ import annotations
 
-from typing import Dict, Iterator, List, Tuple, TYPE_CHECKING
+from typing import Callable, Dict, List, Optional, Tuple, TYPE_CHECKING
 import random
 
+import numpy as np  # type: ignore
 import tcod
 import entity_factories
 from game_map import GameMap
@@ -55,6 +56,7 @@ def get_entities_at_random(
     weighted_chances_by_floor: Dict[int, List[Tuple[Entity, int]]],
     number_of_entities: int,
     floor: int,
+    rng: random.Random,
 ) -> List[Entity]:
     entity_weighted_chances = {}
 
@@ -71,7 +73,7 @@ def get_entities_at_random(
     entities = list(entity_weighted_chances.keys())
     entity_weighted_chance_values = list(entity_weighted_chances.values())
 
-    chosen_entities = random.choices(
+    chosen_entities = rng.choices(
         entities, weights=entity_weighted_chance_values, k=number_of_entities
     )
 
@@ -97,6 +99,11 @@ class RectangularRoom:
         """Return the inner area of this room as a 2D array index."""
         return slice(self.x1 + 1, self.x2), slice(self.y1 + 1, self.y2)
 
+    @property
+    def outer(self) -> Tuple[slice, slice]:
+        """Return the area of this room with its walls as a 2D array index."""
+        return slice(self.x1, self.x2 + 1), slice(self.y1, self.y2 + 1)
+
     def intersects(self, other: RectangularRoom) -> bool:
         """Return True if this room overlaps with another RectangularRoom."""
         return (
@@ -116,76 +123,287 @@ def generate_dungeon(
     engine: Engine,
     branch:str,
     depth:int,
+    rng: random.Random,
 ) -> GameMap:
 
-    """Generate a new dungeon map."""
-    player = engine.player
-    dungeon = GameMap(engine, map_width, map_height, branch, depth, [player])
+    """Generate a new dungeon map.
+    Only `rng` is used for randomness, so that a floor can be generated ahead of time without touching the game state.
+    The player is not placed : GameWorld.set_floor puts the player at `upstairs_location`.
+    """
+    dungeon = GameMap(engine, map_width, map_height, branch, depth)
 
     rooms: List[RectangularRoom] = []
+    # occupancy masks : rooms with their walls, and tiles already holding an entity
+    room_mask = np.zeros((map_width, map_height), dtype=bool, order="F")
+    entity_mask = np.zeros((map_width, map_height), dtype=bool, order="F")
 
     for r in range(max_rooms):
-        room_width = random.randint(room_min_size, room_max_size)
-        room_height = random.randint(room_min_size, room_max_size)
+        room_width = rng.randint(room_min_size, room_max_size)
+        room_height = rng.randint(room_min_size, room_max_size)
 
-        x = random.randint(0, dungeon.width - room_width - 1)
-        y = random.randint(0, dungeon.height - room_height - 1)
+        x = rng.randint(0, dungeon.width - room_width - 1)
+        y = rng.randint(0, dungeon.height - room_height - 1)
 
         # "RectangularRoom" class makes rectangles easier to work with
         new_room = RectangularRoom(x, y, room_width, room_height)
 
-        # Run through the other rooms and see if they intersect with this one.
-        if any(new_room.intersects(other_room) for other_room in rooms):
+        # Check that the room does not intersect any other one
+        if room_mask[new_room.outer].any():
             continue  # This room intersects, so go to the next attempt.
         # If there are no intersections then the room is valid.
+        room_mask[new_room.outer] = True
 
         # Dig out this rooms inner area.
-        dungeon.tiles[new_room.inner] = tile_types.floor
+        dungeon.paint(new_room.inner, tile_types.FLOOR)
 
         if len(rooms) == 0:
             # The first room, where the player starts.
-            player.place(*new_room.center, dungeon)
             dungeon.upstairs_location=new_room.center
+            entity_mask[dungeon.upstairs_location] = True # kept free for the player
             # dungeon.camera.x, dungeon.camera.y = new_room.center
         else:  # All rooms after the first.
             # Dig out a tunnel between this room and the previous one.
-            for x, y in tunnel_between(rooms[-1].center, new_room.center):
-                dungeon.tiles[x, y] = tile_types.floor
+            tunnel = tunnel_between(rooms[-1].center, new_room.center, rng)
+            dungeon.paint((tunnel[:,0], tunnel[:,1]), tile_types.FLOOR)
 
-        place_features(new_room, dungeon, engine.game_world.current_floor)
-        place_entities(new_room, dungeon, engine.game_world.current_floor)
+        place_features(new_room, dungeon, depth, rng, entity_mask)
+        place_entities(new_room, dungeon, depth, rng, entity_mask)
 
         # Finally, append the new room to the list.
         rooms.append(new_room)
 
     # TODO : Wall calculation = all WALL with at least one floor tile ; check path_to_nearest_unexplored_tiles
     
-    i:int = random.randint(1, len(rooms)-1)
-    room:RectangularRoom = rooms[i]
-    dungeon.downstairs_location=(random.randint(room.x1 + 1, room.x2 - 1),
-                                random.randint(room.y1 + 1, room.y2-1))
+    dungeon.downstairs_location = pick_downstairs(rooms, dungeon.upstairs_location, rng)
 
-    dungeon.tiles[dungeon.upstairs_location] = tile_types.up_stairs
-    dungeon.tiles[dungeon.downstairs_location] = tile_types.down_stairs
+    dungeon.paint(dungeon.upstairs_location, tile_types.UP_STAIRS)
+    dungeon.paint(dungeon.downstairs_location, tile_types.DOWN_STAIRS)
 
     # Attach example of walls to the map
     dungeon.wall = entity_factories.wall
 
     return dungeon
 
-def place_entities(room: RectangularRoom, dungeon: GameMap, floor_number: int,) -> None:
-    number_of_monsters = random.randint(
+def generate_bsp_dungeon(
+    max_rooms: int,
+    room_min_size: int,
+    room_max_size: int,
+    map_width: int,
+    map_height: int,
+    engine: Engine,
+    branch:str,
+    depth:int,
+    rng: random.Random,
+) -> GameMap:
+    """Generate a map of rooms, one in each leaf of a binary space partition.
+    Rooms are linked in leaf order, so each one is connected to its neighbour. `max_rooms` is not used."""
+    dungeon = GameMap(engine, map_width, map_height, branch, depth)
+    entity_mask = np.zeros((map_width, map_height), dtype=bool, order="F")
+
+    rooms: List[RectangularRoom] = []
+    for leaf_x, leaf_y, leaf_width, leaf_height in split_area(0, 0, map_width, map_height, room_max_size+1, rng):
+        room_width = rng.randint(room_min_size, min(room_max_size, leaf_width-1))
+        room_height = rng.randint(room_min_size, min(room_max_size, leaf_height-1))
+        x = rng.randint(leaf_x, leaf_x + leaf_width - room_width - 1)
+        y = rng.randint(leaf_y, leaf_y + leaf_height - room_height - 1)
+        rooms.append(RectangularRoom(x, y, room_width, room_height))
+
+    for room in rooms:
+        dungeon.paint(room.inner, tile_types.FLOOR)
+    for previous_room, room in zip(rooms, rooms[1:]):
+        tunnel = tunnel_between(previous_room.center, room.center, rng)
+        dungeon.paint((tunnel[:,0], tunnel[:,1]), tile_types.FLOOR)
+
+    dungeon.upstairs_location = rooms[0].center
+    dungeon.downstairs_location = pick_downstairs(rooms, dungeon.upstairs_location, rng)
+    entity_mask[dungeon.upstairs_location] = True
+
+    for room in rooms:
+        place_features(room, dungeon, depth, rng, entity_mask)
+        place_entities(room, dungeon, depth, rng, entity_mask)
+
+    dungeon.paint(dungeon.upstairs_location, tile_types.UP_STAIRS)
+    dungeon.paint(dungeon.downstairs_location, tile_types.DOWN_STAIRS)
+    dungeon.wall = entity_factories.wall
+
+    return dungeon
+
+def pick_downstairs(rooms: List[RectangularRoom], upstairs: Tuple[int, int], rng: random.Random) -> Tuple[int, int]:
+    """Random tile of a room other than the first one (where the up stairs are).
+    With a single room, a tile of that room other than the up stairs."""
+    room = rooms[rng.randint(1, len(rooms)-1)] if len(rooms) > 1 else rooms[0]
+    candidates = [
+        (x, y)
+        for x in range(room.x1 + 1, room.x2)
+        for y in range(room.y1 + 1, room.y2)
+        if (x, y) != tuple(upstairs)
+    ]
+    if not candidates:
+        # a single room of a single tile : both stairs on it
+        return tuple(upstairs)
+    return rng.choice(candidates)
+
+def split_area(x: int, y: int, width: int, height: int, min_size: int, rng: random.Random) -> List[Tuple[int, int, int, int]]:
+    """Binary space partition of an area into leaves (x, y, width, height) of at least `min_size`.
+    Leaves are listed in tree order : two following leaves are next to each other."""
+    can_split_x = width >= 2*min_size
+    can_split_y = height >= 2*min_size
+    if not (can_split_x or can_split_y):
+        return [(x, y, width, height)]
+
+    # cut the longest side more often
+    if can_split_x and (not can_split_y or rng.random() < width/(width+height)):
+        cut = rng.randint(min_size, width-min_size)
+        return split_area(x, y, cut, height, min_size, rng) + split_area(x+cut, y, width-cut, height, min_size, rng)
+
+    cut = rng.randint(min_size, height-min_size)
+    return split_area(x, y, width, cut, min_size, rng) + split_area(x, y+cut, width, height-cut, min_size, rng)
+
+def generate_cave(
+    max_rooms: int,
+    room_min_size: int,
+    room_max_size: int,
+    map_width: int,
+    map_height: int,
+    engine: Engine,
+    branch:str,
+    depth:int,
+    rng: random.Random,
+) -> GameMap:
+    """Generate a cave with a cellular automaton. Room parameters are not used."""
+    dungeon = GameMap(engine, map_width, map_height, branch, depth)
+    finish_open_floor(dungeon, cave_mask(map_width, map_height, rng), depth, rng)
+
+    return dungeon
+
+def cave_mask(width: int, height: int, rng: random.Random, fill: float = 0.45, steps: int = 4) -> np.ndarray:
+    """Floor mask of a cave : random noise smoothed by the 4-5 rule (a tile becomes a wall with 5+ walls around)."""
+    generator = np.random.default_rng(rng.getrandbits(64))
+    wall = generator.random((width, height)) < fill
+    for _ in range(steps):
+        padded = np.pad(wall, 1, constant_values=True).astype(np.int8)
+        walls_around = sum(
+            padded[1+dx:1+dx+width, 1+dy:1+dy+height]
+            for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy
+        )
+        wall = (walls_around >= 5) | (wall & (walls_around >= 4))
+
+    return np.asfortranarray(~wall)
+
+def generate_drunkard_walk(
+    max_rooms: int,
+    room_min_size: int,
+    room_max_size: int,
+    map_width: int,
+    map_height: int,
+    engine: Engine,
+    branch:str,
+    depth:int,
+    rng: random.Random,
+) -> GameMap:
+    """Generate winding tunnels dug by random walkers. Room parameters are not used."""
+    dungeon = GameMap(engine, map_width, map_height, branch, depth)
+    finish_open_floor(dungeon, drunkard_mask(map_width, map_height, rng), depth, rng)
+
+    return dungeon
+
+def drunkard_mask(width: int, height: int, rng: random.Random, coverage: float = 0.35, steps: int = 400) -> np.ndarray:
+    """Floor mask dug by walkers until `coverage` of the map is floor.
+    Each walk of `steps` moves is drawn at once, then folded back inside the map borders."""
+    generator = np.random.default_rng(rng.getrandbits(64))
+    moves = np.array([(1, 0), (-1, 0), (0, 1), (0, -1)])
+    floor = np.zeros((width, height), dtype=bool, order="F")
+
+    # walkers never reach the borders
+    target = min(coverage*width*height, max(width-2, 0)*max(height-2, 0))
+    x, y = width//2, height//2
+    while np.count_nonzero(floor) < target:
+        walk = np.cumsum(moves[generator.integers(0, 4, steps)], axis=0) + (x, y)
+        xs = reflect(walk[:,0], 1, width-2)
+        ys = reflect(walk[:,1], 1, height-2)
+        floor[xs, ys] = True
+        # next walker starts somewhere on this walk
+        i = generator.integers(steps)
+        x, y = xs[i], ys[i]
+
+    return floor
+
+def reflect(values: np.ndarray, low: int, high: int) -> np.ndarray:
+    """Fold `values` into [low, high], bouncing on the bounds."""
+    if high <= low:
+        return np.full_like(values, low)
+    period = 2*(high-low)
+    folded = (values-low) % period
+    return low + np.where(folded > high-low, period-folded, folded)
+
+def finish_open_floor(dungeon: GameMap, floor_mask: np.ndarray, depth: int, rng: random.Random, area_size: int = 16) -> None:
+    """Turn the floor mask of a map without rooms into a playable floor :
+    only the largest part connected to the up stairs is kept, down stairs are put as far as possible,
+    and each `area_size` square with enough floor is populated like a room."""
+    floor_mask[[0, -1], :] = False
+    floor_mask[:, [0, -1]] = False
+    if np.count_nonzero(floor_mask) < 2:
+        # nothing dug (tiny map or unlucky noise) : a single chamber in the middle
+        width, height = floor_mask.shape
+        floor_mask[width//2-1:width//2+2, height//2-1:height//2+2] = True
+    xs, ys = np.nonzero(floor_mask)
+    cost = floor_mask.astype(np.int8)
+
+    best_dist, best_count = None, 0
+    for _ in range(5):
+        i = rng.randrange(xs.size)
+        dist = tcod.path.maxarray(floor_mask.shape, dtype=np.int32, order="F")
+        dist[xs[i], ys[i]] = 0
+        tcod.path.dijkstra2d(dist, cost, 2, 3, out=dist)
+        count = np.count_nonzero(dist != np.iinfo(np.int32).max)
+        if count > best_count:
+            best_dist, best_count, start = dist, count, (int(xs[i]), int(ys[i]))
+
+    reachable = best_dist != np.iinfo(np.int32).max
+    dungeon.paint(reachable, tile_types.FLOOR)
+    dungeon.upstairs_location = start
+    far = np.where(reachable, best_dist, -1)
+    dungeon.downstairs_location = tuple(int(v) for v in np.unravel_index(far.argmax(), far.shape))
+
+    entity_mask = np.zeros(floor_mask.shape, dtype=bool, order="F")
+    entity_mask[dungeon.upstairs_location] = True
+    for area_x in range(0, dungeon.width, area_size):
+        for area_y in range(0, dungeon.height, area_size):
+            area = RectangularRoom(area_x-1, area_y-1, area_size+1, area_size+1)
+            if np.count_nonzero(reachable[area.inner]) >= area_size*area_size//4:
+                place_features(area, dungeon, depth, rng, entity_mask)
+                place_entities(area, dungeon, depth, rng, entity_mask)
+
+    dungeon.paint(dungeon.upstairs_location, tile_types.UP_STAIRS)
+    dungeon.paint(dungeon.downstairs_location, tile_types.DOWN_STAIRS)
+    dungeon.wall = entity_factories.wall
+
+def pick_free_spot(room: RectangularRoom, dungeon: GameMap, entity_mask: np.ndarray, rng: random.Random) -> Optional[Tuple[int, int]]:
+    """Return a random walkable tile of the room inner area without entity, and mark it as taken.
+    None if the room is full."""
+    xs, ys = np.nonzero(~entity_mask[room.inner] & dungeon.walkable[room.inner])
+    if xs.size == 0:
+        return None
+
+    i = rng.randrange(xs.size)
+    x, y = room.x1 + 1 + int(xs[i]), room.y1 + 1 + int(ys[i])
+    entity_mask[x, y] = True
+
+    return x, y
+
+def place_entities(room: RectangularRoom, dungeon: GameMap, floor_number: int, rng: random.Random, entity_mask: np.ndarray) -> None:
+    number_of_monsters = rng.randint(
         0, get_max_value_for_floor(max_monsters_by_floor, floor_number)
     )
-    number_of_items = random.randint(
+    number_of_items = rng.randint(
         0, get_max_value_for_floor(max_items_by_floor, floor_number)
     )
 
     monsters: List[Entity] = get_entities_at_random(
-        enemy_chances, number_of_monsters, floor_number
+        enemy_chances, number_of_monsters, floor_number, rng
     )
     items: List[Entity] = get_entities_at_random(
-        item_chances, number_of_items, floor_number
+        item_chances, number_of_items, floor_number, rng
     )
 
 
@@ -196,40 +414,37 @@ def place_entities(room: RectangularRoom, dungeon: GameMap, floor_number: int,)
     #         entity.spawn(dungeon, x, y)
   
     for entity in monsters:
-        x = random.randint(room.x1 + 1, room.x2 - 1)
-        y = random.randint(room.y1 + 1, room.y2 - 1)
-        if not any(entity.x == x and entity.y == y for entity in dungeon.entities):
-            clone = entity.spawn(dungeon, x, y)
+        spot = pick_free_spot(room, dungeon, entity_mask, rng)
+        if spot:
+            clone = entity.spawn(dungeon, *spot)
             # purge inventory and equip
-            item = random.choice(clone.inventory.items) 
+            item = rng.choice(clone.inventory.items) 
             clone.inventory.items = [item]
             if item:
                 clone.equipment.toggle_equip(item,False)
          
     for entity in items:
-        x = random.randint(room.x1 + 1, room.x2 - 1)
-        y = random.randint(room.y1 + 1, room.y2 - 1)
-        if not any(entity.x == x and entity.y == y for entity in dungeon.entities):
-            entity.spawn(dungeon, x, y)
+        spot = pick_free_spot(room, dungeon, entity_mask, rng)
+        if spot:
+            entity.spawn(dungeon, *spot)
          
 
-def place_features(room: RectangularRoom, dungeon: GameMap, floor_number: int,) -> None:
+def place_features(room: RectangularRoom, dungeon: GameMap, floor_number: int, rng: random.Random, entity_mask: np.ndarray) -> None:
 
         entity = entity_factories.explosive_barrel
 
-        x = random.randint(room.x1 + 1, room.x2 - 1)
-        y = random.randint(room.y1 + 1, room.y2 - 1)
-        if not any(entity.x == x and entity.y == y for entity in dungeon.entities):
-            entity.spawn(dungeon, x, y)
+        spot = pick_free_spot(room, dungeon, entity_mask, rng)
+        if spot:
+            entity.spawn(dungeon, *spot)
 
 
 def tunnel_between(
-    start: Tuple[int, int], end: Tuple[int, int]
-    ) -> Iterator[Tuple[int, int]]:
-    """Return an L-shaped tunnel between these two points."""
+    start: Tuple[int, int], end: Tuple[int, int], rng: random.Random
+    ) -> np.ndarray:
+    """Return the (N,2) coordinates of an L-shaped tunnel between these two points."""
     x1, y1 = start
     x2, y2 = end
-    if random.random() < 0.5:  # 50% chance.
+    if rng.random() < 0.5:  # 50% chance.
         # Move horizontally, then vertically.
         corner_x, corner_y = x2, y1
     else:
@@ -237,9 +452,19 @@ def tunnel_between(
         corner_x, corner_y = x1, y2
 
     # Generate the coordinates for this tunnel.
-    for x, y in tcod.los.bresenham((x1, y1), (corner_x, corner_y)).tolist():
-        yield x, y
-    for x, y in tcod.los.bresenham((corner_x, corner_y), (x2, y2)).tolist():
-        yield x, y
+    return np.concatenate((
+        tcod.los.bresenham((x1, y1), (corner_x, corner_y)),
+        tcod.los.bresenham((corner_x, corner_y), (x2, y2)),
+    ))
 
 
+
+
+# Floor generator of each branch, see GameWorld.generate_floor
+# Stairs stay in their branch : a game starts in a branch (main.py --branch) and goes down it.
+generators: Dict[str, Callable[..., GameMap]] = {
+    "main": generate_dungeon,
+    "complex": generate_bsp_dungeon,
+    "caves": generate_cave,
+    "sewers": generate_drunkard_walk,
+}
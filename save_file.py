@@ -0,0 +1,198 @@
+"""Save files : one record per floor, serialized again only when the floor changed.
+
+A save is a zip archive, stored as is (records are already compressed) :
+   * `header`: format version and codec of the engine record (json)
+   * `engine`: pickle of the engine, with the player, the turn queue and the current floor
+     (the queue and fire lines hold its entities), compressed with the codec chosen by `uv.save_codec`
+   * `floors/<branch>/<depth>`: each other floor, frozen by `floor_storage`
+A floor the player left does not change until they come back : frozen floors are written as they are, and the
+record of a live floor is kept in `GameWorld.saved_floors` for the next saves. On load, floors stay frozen until
+the player enters them.
+
+Saving is split in two : a `snapshot` taken on the game thread (pickling, no compression), and `write` that
+compresses and replaces the file, run by the `Autosave` worker thread for periodic saves. Autosaves only dump the
+live floors without a record, the worker compresses them too.
+"""
+from __future__ import annotations
+
+import bz2
+import json
+import lzma
+import os
+import pickle
+import time
+import zipfile
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple, TYPE_CHECKING
+
+import floor_storage
+from floor_storage import FrozenFloor
+import util.var_global as uv
+
+if TYPE_CHECKING:
+    from engine import Engine
+
+HEADER_RECORD = "header"
+ENGINE_RECORD = "engine"
+SAVE_VERSION = 1
+
+
+class Codec(NamedTuple):
+    compress: Callable[[bytes], bytes]
+    decompress: Callable[[bytes], bytes]
+
+
+# name : codec, from the fastest to the smallest of each family
+CODECS: Dict[str, Codec] = {"none": Codec(bytes, bytes)}
+CODECS.update({f"zlib-{level}": Codec(partial(zlib.compress, level=level), zlib.decompress) for level in range(1, 10)})
+CODECS.update({f"bz2-{level}": Codec(partial(bz2.compress, compresslevel=level), bz2.decompress) for level in range(1, 10)})
+CODECS.update({f"lzma-{preset}": Codec(partial(lzma.compress, preset=preset), lzma.decompress) for preset in range(10)})
+
+
+def floor_record(key: Tuple[str, int]) -> str:
+    branch, depth = key
+    return f"floors/{branch}/{depth}"
+
+
+class Snapshot(NamedTuple):
+    """Game state at a point in time, independant from the running game"""
+    engine_data: bytes # uncompressed pickle
+    floors: Dict[Tuple[str, int], FrozenFloor]
+    dumped_floors: Dict[Tuple[str, int], FrozenFloor] # blobs left to compress, see floor_storage.dump
+
+
+def snapshot(engine: Engine, compress_floors: bool = True) -> Snapshot:
+    """Take the snapshot of `engine` (without renderer).
+    Live floors without a record get one, kept for the next saves, unless `compress_floors` is False : they are
+    then only dumped, and compressed by `write` (on the autosave thread)."""
+    world = engine.game_world
+    frozen_floors, dumped_floors = {}, {}
+    for key, (game_map, _, _) in world.floors.items():
+        if isinstance(game_map, FrozenFloor):
+            frozen_floors[key] = game_map
+        elif key in world.saved_floors:
+            frozen_floors[key] = world.saved_floors[key]
+        elif compress_floors:
+            frozen_floors[key] = world.saved_floors[key] = floor_storage.freeze(game_map)
+        else:
+            dumped_floors[key] = floor_storage.dump(game_map)
+
+    # other floors are records of their own, only their player position stays in the engine record
+    floors = world.floors
+    world.floors = OrderedDict((key, (None, player_x, player_y)) for key, (_, player_x, player_y) in floors.items())
+    try:
+        engine_data = pickle.dumps(engine, protocol=pickle.HIGHEST_PROTOCOL)
+    finally:
+        world.floors = floors
+
+    return Snapshot(engine_data, frozen_floors, dumped_floors)
+
+
+def write(snapshot: Snapshot, filename: str, codec: Optional[str] = None) -> None:
+    """Write the save file, replaced only once complete. `codec` defaults to `uv.save_codec`"""
+    codec = codec or uv.save_codec
+    temp_filename = filename + ".tmp"
+    with zipfile.ZipFile(temp_filename, "w", compression=zipfile.ZIP_STORED) as archive:
+        archive.writestr(HEADER_RECORD, json.dumps({"version": SAVE_VERSION, "codec": codec}))
+        archive.writestr(ENGINE_RECORD, CODECS[codec].compress(snapshot.engine_data))
+        for key, frozen in snapshot.floors.items():
+            archive.writestr(floor_record(key), pickle.dumps(frozen, protocol=pickle.HIGHEST_PROTOCOL))
+        for key, dumped in snapshot.dumped_floors.items():
+            archive.writestr(floor_record(key), pickle.dumps(floor_storage.compress(dumped), protocol=pickle.HIGHEST_PROTOCOL))
+    os.replace(temp_filename, filename)
+
+
+def load(filename: str) -> Engine:
+    """Read a save : the current floor is ready, the others are thawed when entered (see GameWorld.set_floor)."""
+    with zipfile.ZipFile(filename) as archive:
+        engine = pickle.loads(read_engine_record(archive))
+        world = engine.game_world
+        for key, (_, player_x, player_y) in world.floors.items():
+            world.floors[key] = (pickle.loads(archive.read(floor_record(key))), player_x, player_y)
+
+    return engine
+
+
+def read_engine_record(archive: zipfile.ZipFile) -> bytes:
+    """Uncompressed engine record, with the codec named in the header"""
+    header = json.loads(archive.read(HEADER_RECORD))
+    if header["version"] != SAVE_VERSION:
+        raise ValueError(f"Save format {header['version']} not supported")
+    return CODECS[header["codec"]].decompress(archive.read(ENGINE_RECORD))
+
+
+def benchmark(filename: str, codecs: Iterable[str] = CODECS, repeat: int = 3) -> List[Tuple[str, int, float, float]]:
+    """Size and best compress / decompress times (seconds) of the engine record of a save, for each codec.
+    Floor records are stored in their frozen form whatever the codec, and not measured."""
+    with zipfile.ZipFile(filename) as archive:
+        data = read_engine_record(archive)
+
+    results = []
+    for name in codecs:
+        codec = CODECS[name]
+        compress_time = decompress_time = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            compressed = codec.compress(data)
+            middle = time.perf_counter()
+            codec.decompress(compressed)
+            compress_time = min(compress_time, middle - start)
+            decompress_time = min(decompress_time, time.perf_counter() - middle)
+        results.append((name, len(compressed), compress_time, decompress_time))
+
+    return results
+
+
+class Autosave:
+    """Save every `uv.autosave_turns` turns (0 : never) and after each floor change.
+    The game thread only takes the snapshot, a worker thread writes it."""
+    def __init__(self, engine: Engine, filename: str = "savegame.sav"):
+        self.engine = engine
+        self.filename = filename
+        self.last_turn = 0
+        self.floor_changed = False
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.pending: Optional[Future] = None
+
+    def __getstate__(self) -> dict:
+        # threads can't be saved
+        state = self.__dict__.copy()
+        del state["executor"]
+        state["pending"] = None
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def request(self) -> None:
+        """Save at the next check, whatever the turn"""
+        self.floor_changed = True
+
+    def check(self) -> None:
+        """Start a save if one is due. To be called when the game waits for the player : the saved state is then
+        the same as a save on quit."""
+        if uv.autosave_turns <= 0 or not self.engine.player.is_alive:
+            return
+        if not self.floor_changed and self.engine.turn_count - self.last_turn < uv.autosave_turns:
+            return
+        if self.pending and not self.pending.done():
+            # previous save still being written, try again next turn
+            return
+
+        self.floor_changed = False
+        self.last_turn = self.engine.turn_count
+        self.pending = self.executor.submit(write, self.engine.snapshot(compress_floors=False), self.filename)
+        self.pending.add_done_callback(self.log_failure)
+
+    def log_failure(self, future: Future) -> None:
+        if future.exception() and self.engine.logger:
+            self.engine.logger.error(f"Autosave failed : {future.exception()!r}")
+
+    def wait(self) -> None:
+        """Let the save being written finish (before another save or the removal of the save file)"""
+        if self.pending:
+            self.pending.exception() # failures are logged, not raised
@@ -0,0 +1,87 @@
+"""What hostiles perceive of the player, sensed in batches.
+
+All the actors whose ticket is due at the same time are sensed at once, with a few array lookups, when the first
+of them acts. They still act one by one in ticket order : the sense of an actor is only used if neither the actor
+nor the player moved since, otherwise it is sensed again alone.
+"""
+from __future__ import annotations
+
+from typing import Dict, List, NamedTuple, Tuple, TYPE_CHECKING
+
+import numpy as np  # type: ignore
+
+from entity import Actor
+from various_enum import ItemType
+
+if TYPE_CHECKING:
+    from engine import Engine
+
+
+class Sense(NamedTuple):
+    """Player as perceived by an actor standing at `position`
+       * `visible`: the actor is in the player FOV (thus sees the player)
+       * `distance`: Chebyshev distance to the player
+       * `in_range`: the player is within the range of the actor's ranged weapon"""
+    position: Tuple[int, int]
+    visible: bool
+    distance: int
+    in_range: bool
+
+
+class HostileSenses:
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.reset()
+
+    def reset(self) -> None:
+        self.time = -1
+        self.player_position = (-1, -1)
+        self.senses: Dict[Actor, Sense] = {}
+
+    def __getstate__(self) -> dict:
+        # only valid for the current batch
+        return {"engine": self.engine}
+
+    def __setstate__(self, state: dict) -> None:
+        self.engine = state["engine"]
+        self.reset()
+
+    def of(self, actor: Actor) -> Sense:
+        """Sense of the acting `actor`, from the batch of its time when still valid."""
+        engine = self.engine
+        player = engine.player
+        if self.time != engine.turnqueue.current_time or self.player_position != (player.x, player.y) or actor not in self.senses:
+            self.time = engine.turnqueue.current_time
+            self.player_position = (player.x, player.y)
+            # the actor has left the queue to act, the rest of its batch is still in it (hazards do not sense)
+            batch = [entity for entity in engine.turnqueue.due_now(exclude=player) if isinstance(entity, Actor)]
+            self.senses = self.sense([actor] + batch)
+
+        sense = self.senses[actor]
+        if sense.position != (actor.x, actor.y):
+            sense = self.senses[actor] = self.sense([actor])[actor]
+        return sense
+
+    def sense(self, actors: List[Actor]) -> Dict[Actor, Sense]:
+        player = self.engine.player
+        xs = np.fromiter((actor.x for actor in actors), dtype=np.intp, count=len(actors))
+        ys = np.fromiter((actor.y for actor in actors), dtype=np.intp, count=len(actors))
+        ranges = np.fromiter((weapon_range(actor) for actor in actors), dtype=np.int32, count=len(actors))
+
+        visible = self.engine.game_map.visible[xs, ys]
+        distances = np.maximum(np.abs(xs-player.x), np.abs(ys-player.y))
+        in_range = distances <= ranges
+
+        return {
+            actor: Sense((x, y), seen, distance, shot)
+            for actor, x, y, seen, distance, shot in zip(actors, xs.tolist(), ys.tolist(), visible.tolist(), distances.tolist(), in_range.tolist())
+        }
+
+
+def weapon_range(actor: Actor) -> int:
+    """Range of the ranged weapon of `actor`, -1 without one"""
+    equipment = getattr(actor, "equipment", None)
+    weapon = equipment.weapon if equipment else None
+    if weapon is None or weapon.item_type != ItemType.RANGED_WEAPON:
+        return -1
+    return weapon.equippable.base_range
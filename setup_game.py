@@ -7,8 +7,6 @@ from typing import Optional
 import tcod
 from tcod import libtcodpy
 
-import lzma
-import pickle
 import traceback
 
 import color
@@ -17,6 +15,7 @@ import util.var_global as uv
 from engine import Engine
 import entity_factories
 import input_handlers
+import save_file
 from game_map import GameWorld
 from renderer import Renderer
 from various_enum import ItemType
@@ -40,7 +39,7 @@ def new_game() -> Engine:
     # One last thing we can do is give the player a bit of equipment to start. We’ll spawn a dagger and leather armor, and immediately add them to the player’s inventory.
     # https://rogueliketutorials.com/tutorials/tcod/v2/part-13/
 
-    engine = Engine(player=player)
+    engine = Engine(player=player, world_seed=uv.seed_init)
 
     # Player initialization
     # Equip first weapon
@@ -57,10 +56,9 @@ def new_game() -> Engine:
         room_max_size=room_max_size,
         map_width=map_width,
         map_height=map_height,
-        seed_init=uv.seed_init,
     )
 
-    engine.game_world.set_floor(depth=1)
+    engine.game_world.set_floor(depth=1, branch=uv.start_branch)
     # engine.player_lof.parent = engine.game_map
     # engine.hostile_lof.parent = engine.game_map
     engine.update_fov()
@@ -73,8 +71,7 @@ def new_game() -> Engine:
 
 def load_game(filename: str) -> Engine:
     """Load an Engine instance from a file."""
-    with open(filename, "rb") as f:
-        engine = pickle.loads(lzma.decompress(f.read()))
+    engine = save_file.load(filename)
     assert isinstance(engine, Engine)
     return engine
 
@@ -53,4 +53,10 @@ up_stairs = new_tile(
     transparent=True,
     dark=(ord("<"), color.b_darkgray, color.n_black),
     light=(ord("<"), color.n_gray, color.n_black),
-)
\ No newline at end of file
+)
+# Tile ids : index of each tile type in this registry, the uint8 values of `GameMap.tiles`
+FLOOR, WALL, DOWN_STAIRS, UP_STAIRS = range(4)
+registry = np.stack([floor, wall, down_stairs, up_stairs])
+
+# Graphics of each tile id, by display state : 0 unexplored, 1 explored (dark), 2 visible (light). See GameMap.render
+graphics = np.stack([np.full(len(registry), SHROUD), registry["dark"], registry["light"]])
@@ -1,5 +1,5 @@
 import heapq
-from typing import List, NamedTuple
+from typing import Iterable, List, NamedTuple, Optional, Set
 from entity import Entity
 
 class Ticket(NamedTuple):
@@ -45,6 +45,35 @@ class TurnQueue:
             if entity == ticket.entity:
                 self.heap.pop(idx)
 
+    def park(self, entities: Set[Entity]) -> List[Ticket]:
+        """Take the tickets of `entities` out of the queue (entities of a floor the player leaves).
+        The returned tickets hold the time left before their turn instead of an absolute time.
+        """
+        parked = [Ticket(ticket.time-self.current_time, ticket.ticket_id, ticket.entity) for ticket in self.heap if ticket.entity in entities]
+        self.heap = [ticket for ticket in self.heap if ticket.entity not in entities]
+        heapq.heapify(self.heap)
+
+        return sorted(parked)
+
+    def unpark(self, tickets: Iterable[Ticket], elapsed: int = 0) -> None:
+        """Put back parked `tickets` in the queue, `elapsed` time after they were parked.
+        Their order is kept.
+        """
+        for ticket in sorted(tickets):
+            self.schedule(max(0, ticket.time-elapsed), ticket.entity)
+
+    def due_now(self, exclude: Optional[Entity] = None) -> List[Entity]:
+        """Entities whose ticket is due at the current time (they are next), in ticket order.
+        Only the top of the heap is visited : the children of a later ticket are later too."""
+        heap = self.heap
+        due: List[Ticket] = []
+        stack = [0] if heap and heap[0].time == self.current_time else []
+        while stack:
+            index = stack.pop()
+            due.append(heap[index])
+            stack.extend(child for child in (2*index+1, 2*index+2) if child < len(heap) and heap[child].time == self.current_time)
+        return [ticket.entity for ticket in sorted(due) if ticket.entity is not exclude]
+
     def invoke_next(self) -> Entity:
         """Call the next scheduled entity.
         
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-from typing import List, Tuple, TYPE_CHECKING
+from typing import Optional, Tuple, TYPE_CHECKING
+from functools import lru_cache
 
 import numpy as np
 import math
@@ -21,34 +22,55 @@ MOVE_KEYS = {
 }
 
 
-def circle_coords(center: Tuple[int,int], radius:int) -> List[Tuple[int,int]]:
-    """Returns the list of coordinates of the circle around center using Chebyshev distance"""
-    result: List = []
-    x0 = center[0]
-    y0 = center[1]
+@lru_cache(maxsize=None)
+def circle_offsets(radius: int) -> np.ndarray:
+    """Returns the (N,2) array of offsets of the circle of `radius` using Chebyshev distance"""
     if radius < 0:
         raise ValueError("Radius must be greater than zero")
     if radius == 0:
-        return center
-    for i in range(x0-radius, x0+radius+1):
-        result.append([i,y0+radius])
-        result.append([i,y0-radius])
-    for j in range(y0-radius+1, y0+radius):
-        result.append([x0-radius,j])
-        result.append([x0+radius,j])
-    return result
-
-def disk_coords(center: Tuple[int,int], radius:int) -> List[Tuple[int,int]]:
-    """Returns the list of coordinates of the disk around center using Chebyshev distance"""
-    result: List = []
-    x0 = center[0]
-    y0 = center[1]
+        offsets = np.zeros((1,2), dtype=np.int32)
+    else:
+        side = np.arange(-radius, radius+1, dtype=np.int32)
+        inner = side[1:-1]
+        offsets = np.concatenate((
+            np.column_stack((side, np.full_like(side, radius))),
+            np.column_stack((side, np.full_like(side, -radius))),
+            np.column_stack((np.full_like(inner, -radius), inner)),
+            np.column_stack((np.full_like(inner, radius), inner)),
+        ))
+    offsets.flags.writeable = False
+    return offsets
+
+@lru_cache(maxsize=None)
+def disk_offsets(radius: int) -> np.ndarray:
+    """Returns the (N,2) array of offsets of the disk of `radius` using Chebyshev distance"""
     if radius < 0:
         raise ValueError("Radius must be greater than zero")
-    for i in range(x0-radius, x0+radius+1):
-        for j in range(y0-radius, y0+radius+1):
-            result.append([i,j])
-    return result
+    dx, dy = offset_grid(radius)
+    offsets = np.column_stack((dx.ravel(), dy.ravel())).astype(np.int32)
+    offsets.flags.writeable = False
+    return offsets
+
+def translate_offsets(offsets: np.ndarray, center: Tuple[int,int], shape: Optional[Tuple[int,int]] = None) -> np.ndarray:
+    """Moves `offsets` around `center`. If `shape` is provided, coordinates out of the map are clipped."""
+    coords = offsets + np.array(center, dtype=np.int32)
+    if shape is not None:
+        inside = (coords[:,0] >= 0) & (coords[:,0] < shape[0]) & (coords[:,1] >= 0) & (coords[:,1] < shape[1])
+        coords = coords[inside]
+    return coords
+
+def circle_coords(center: Tuple[int,int], radius:int, shape: Optional[Tuple[int,int]] = None) -> np.ndarray:
+    """Returns the (N,2) array of coordinates of the circle around center using Chebyshev distance"""
+    return translate_offsets(circle_offsets(radius), center, shape)
+
+def disk_coords(center: Tuple[int,int], radius:int, shape: Optional[Tuple[int,int]] = None) -> np.ndarray:
+    """Returns the (N,2) array of coordinates of the disk around center using Chebyshev distance"""
+    return translate_offsets(disk_offsets(radius), center, shape)
+
+def walkable_disk_coords(center: Tuple[int,int], radius:int, walkable: np.ndarray) -> np.ndarray:
+    """Returns the (N,2) array of coordinates of the disk around center, restricted to the `walkable` tiles"""
+    coords = disk_coords(center, radius, walkable.shape)
+    return coords[walkable[coords[:,0], coords[:,1]]]
 
 def move_path(map_fov: np.ndarray, shooter_xy: Tuple[int,int], target_xy: Tuple[int,int] ) -> np.ndarray:
     """ Computes the path between shooter and target
@@ -133,39 +155,64 @@ def get_project_point(start: Tuple[int,int], end: Tuple[int,int], dist: int) ->
 
     return (round(start[0]+dist*math.cos(alpha)), round(start[1]+dist*math.sin(alpha)))
 
-def get_cone_points(start: Tuple[int,int], end: Tuple[int,int], cone_radius:int, dist:int =10) -> List[Tuple[int,int]]:
-    """Returns all the points in the cone of length `dist` and radius `cone_radius` without `start` point"""
-    cone_points=np.array([start],dtype=np.int32)
-    result=cone_points
-    # extension to 10
-    end=get_project_point(start,end,10)
-    # a point, on a perpenducular segment
-    perp1=( start[1]-end[1]+end[0],
-           -start[0]+end[0]+end[1] )
-
-    # # add each rays
-    # for i in range(-cone_radius,cone_radius+1):
-    #     cone_point=get_project_point(end,perp1,i)
-    #     segment=tcod.los.bresenham(start,cone_point)
-    #     cone_points=np.vstack((cone_points,segment)) # or concatenate)
-
-    # borders
-    cone_point1=get_project_point(end,perp1,-cone_radius)
-    cone_point2=get_project_point(end,perp1,cone_radius)
-    segment1=tcod.los.bresenham(start,cone_point1)
-    segment2=tcod.los.bresenham(start,cone_point2)
-    top=tcod.los.bresenham(cone_point1,cone_point2)
-    cone_points=np.vstack((segment1,segment2,top)) # or concatenate)
-
-    # fill the area
-    xmin=min(start[0],cone_point1[0],cone_point2[0])
-    xmax=max(start[0],cone_point1[0],cone_point2[0])
-
-    # https://stackoverflow.com/questions/1962980/selecting-rows-from-a-numpy-ndarray
-    for i in range(xmin,xmax+1):
-        ymin=np.amin(cone_points[cone_points[:,0]==i][:,1])
-        ymax=np.amax(cone_points[cone_points[:,0]==i][:,1])
-        result = np.vstack((result,tcod.los.bresenham((i,ymin),(i,ymax))))
-
-    return (x for x in np.unique(result,axis=0).tolist() if x != [*start]) # how to remove start from numpy.array ?
+# Number of direction sectors used to cache the cone masks (each sector is 360/64 degrees wide)
+CONE_SECTORS = 64
+
+@lru_cache(maxsize=None)
+def offset_grid(size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the (dx, dy) offsets of the square [-size, size]², indexed [dx+size, dy+size]"""
+    dx, dy = np.mgrid[-size:size+1, -size:size+1]
+    dx.flags.writeable = False
+    dy.flags.writeable = False
+    return dx, dy
+
+@lru_cache(maxsize=None)
+def cone_offsets(sector: int, cone_radius: int, dist: int) -> np.ndarray:
+    """Returns the boolean mask of a cone pointing to the `sector` direction, centered on [dist, dist].
+    The cone is the triangle of length `dist` whose base has a half width of `cone_radius`.
+    The apex (shooter) is excluded."""
+    dx, dy = offset_grid(dist)
+    alpha = sector * 2 * math.pi / CONE_SECTORS
+    ux, uy = math.cos(alpha), math.sin(alpha)
+
+    along = dx*ux + dy*uy
+    across = np.abs(dx*uy - dy*ux)
+
+    # +0.5 : a cell is in the cone as soon as its center is less than half a cell away from the border
+    mask = (along > 0) & (along <= dist + 0.5) & (across <= along*cone_radius/dist + 0.5)
+    mask.flags.writeable = False
+    return mask
+
+@lru_cache(maxsize=None)
+def disk_offsets_mask(radius: int) -> np.ndarray:
+    """Returns the boolean mask of the disk (Chebyshev distance) of `radius`, centered on [radius, radius]"""
+    mask = np.ones((2*radius+1, 2*radius+1), dtype=bool)
+    mask.flags.writeable = False
+    return mask
+
+def stamp_mask(local: np.ndarray, center: Tuple[int,int], shape: Tuple[int,int]) -> np.ndarray:
+    """Returns a boolean mask of `shape` with the square `local` mask pasted around `center`.
+    Whatever falls out of the map is clipped."""
+    result = np.zeros(shape, dtype=bool, order="F")
+    r = local.shape[0]//2
+    x0, y0 = center[0]-r, center[1]-r
+    x1, y1 = max(0, x0), max(0, y0)
+    x2, y2 = min(shape[0], x0+local.shape[0]), min(shape[1], y0+local.shape[1])
+    if x1 < x2 and y1 < y2:
+        result[x1:x2, y1:y2] = local[x1-x0:x2-x0, y1-y0:y2-y0]
+    return result
 
+def get_cone_mask(start: Tuple[int,int], end: Tuple[int,int], cone_radius: int, shape: Tuple[int,int], dist: int = 10) -> np.ndarray:
+    """Returns the boolean mask (map sized) of the cone from `start` toward `end`,
+    of length `dist` and base half width `cone_radius`, without `start` point.
+    Use np.nonzero() to get the coordinates."""
+    alpha = math.atan2(end[1]-start[1], end[0]-start[0])
+    sector = round(alpha * CONE_SECTORS / (2 * math.pi)) % CONE_SECTORS
+
+    return stamp_mask(cone_offsets(sector, cone_radius, dist), start, shape)
+
+def get_disk_mask(center: Tuple[int,int], radius: int, shape: Tuple[int,int]) -> np.ndarray:
+    """Returns the boolean mask (map sized) of the disk around center using Chebyshev distance"""
+    if radius < 0:
+        raise ValueError("Radius must be greater than zero")
+    return stamp_mask(disk_offsets_mask(radius), center, shape)
@@ -5,11 +5,15 @@ from typing import Optional, Tuple, TYPE_CHECKING
 
 
 from entity import Entity, Actor, Item
+from util.random_streams import COMBAT
+import util.log as log
 
-def roll(pool: int) -> int:
+logger = log.get(log.COMBAT)
+
+def roll(pool: int, rng: random.Random) -> int:
     success = 0
     for i in range(0,pool):
-        if random.randint(1,3) == 3:
+        if rng.randint(1,3) == 3:
             success += 1
     return success
 
@@ -28,10 +32,12 @@ def hit_calculation(shooter: Actor, target: Entity) -> Tuple(int, Entity):
         defense = base_defense + cover
 
         # Roll !
-        attack_success = roll(attack)
-        defense_success = roll(defense)
+        rng = shooter.gamemap.engine.rng.get(COMBAT)
+        attack_success = roll(attack, rng)
+        defense_success = roll(defense, rng)
         
-        shooter.gamemap.engine.logger.debug(f"Att:{attack_success} success on {attack}, Def:{defense_success} on {defense}")
+        if log.debug.combat:
+            logger.debug("Att:%s success on %s, Def:%s on %s", attack_success, attack, defense_success, defense)
 
         if attack_success:
             hit_margin = attack_success - defense_success
@@ -52,7 +58,8 @@ def stray_fire(fire_line) -> Tuple(int, Entity):
     """
     target = fire_line.target
     hit_margin = 0
-    if random.randint(0,1) == 0:
+    rng = fire_line.parent.rng.get(COMBAT)
+    if rng.randint(0,1) == 0:
         if target:
             # TODO : take into account global size of cover ? Excluding wall ?
             # TODO : 50% is more than what you will get with agile opponent. How to avoid this exploit (fire behind) ?
@@ -65,10 +72,11 @@ def stray_fire(fire_line) -> Tuple(int, Entity):
             for entity in fire_line.entities:
                 entity_weighted_chance_values.append(entity.size.value)
 
-            entity = random.choices(fire_line.entities,entity_weighted_chance_values)
+            entity = rng.choices(fire_line.entities,entity_weighted_chance_values)
             hit_margin = 0
             target = entity[0]
-            fire_line.parent.logger.debug(f"Interception:{target.name}")
+            if log.debug.combat:
+                logger.debug("Interception:%s", target.name)
         else:
             if target:
                 hit_margin = None
@@ -96,12 +104,14 @@ def damage_calculation(weapon: Item, target: Entity, hit_margin) -> Tuple[int,in
     damage = weapon.equippable.base_damage + hit_margin # TODO : bonus ??
     armor = target.fightable.armor # TODO : bonus ?
 
-    armor_reduction = roll(armor)
+    armor_reduction = roll(armor, target.gamemap.engine.rng.get(COMBAT))
 
-    target.gamemap.engine.logger.debug(f"Armor damage reduction:{armor_reduction} success on {armor}")
+    if log.debug.combat:
+        logger.debug("Armor damage reduction:%s success on %s", armor_reduction, armor)
     if shooter:
         damage += shooter.aim_stack
-        shooter.gamemap.engine.logger.debug(f"Damage aim bonus:{shooter.aim_stack}")
+        if log.debug.combat:
+            logger.debug("Damage aim bonus:%s", shooter.aim_stack)
 
     return damage,armor_reduction
 
@@ -13,35 +13,8 @@ def wait() -> Iterator[Any]:
     if not uv.xterm:
         return tcod.event.wait()
     else:
-        # scancode https://python-tcod.readthedocs.io/en/latest/tcod/event.html#tcod.event.Scancode
-        # keysim https://python-tcod.readthedocs.io/en/latest/tcod/event.html#tcod.event.KeySym
-        # mod https://python-tcod.readthedocs.io/en/latest/tcod/event.html#tcod.event.Modifier
         uv.xterm.nodelay(False)
-        key = uv.xterm.getch()
-        mod = 0
-        if key >= 97 and key <= 122:
-            mod = 0
-        elif key >= 65 and key <= 90:
-            mod = 3 # shift
-            key += 32
-        elif key == 62: # shift+G
-            key = 60
-            mod = 3
-        elif key == 16: # ctrl+P
-            key = 112
-            mod = 192       
-        elif key == 63: # shift+,
-            mod=3
-            key=44
-
-
-        event = tcod.event.KeyDown(scancode=0,sym=key,mod=mod)
-        event.type = "KEYDOWN"
-
-        # if key == curses.KEY_RESIZE or key == curses.KEY_MAX:
-        #     event = tcod.event.WindowEvent()
-        
-        return [event] # TODO : iterator ??
+        return [key_event(uv.xterm.getch())] # TODO : iterator ??
 
 def get() -> Iterator[Any]:
 
@@ -53,14 +26,45 @@ def get() -> Iterator[Any]:
             if isinstance(event, tcod.event.KeyDown)
         )
     else:
+        # every key typed ahead
         uv.xterm.nodelay(True)
         key = uv.xterm.getch()
+        while key != -1:
+            yield key_event(key)
+            key = uv.xterm.getch()
+
+def pending() -> Iterator[Any]:
+    """Every event received so far, without waiting (unlike `get`, not only the keys)"""
+    if not uv.xterm:
+        yield from tcod.event.get()
+    else:
+        yield from get()
+
+def key_event(key: int) -> tcod.event.KeyDown:
+    """KeyDown event of a curses key code"""
+    # scancode https://python-tcod.readthedocs.io/en/latest/tcod/event.html#tcod.event.Scancode
+    # keysim https://python-tcod.readthedocs.io/en/latest/tcod/event.html#tcod.event.KeySym
+    # mod https://python-tcod.readthedocs.io/en/latest/tcod/event.html#tcod.event.Modifier
+    mod = 0
+    if key >= 97 and key <= 122:
         mod = 0
-        if key == -1:
-            return None
-        else:
-            event = tcod.event.KeyDown(scancode=0,sym=key,mod=mod)
-            event.type = "KEYDOWN"
+    elif key >= 65 and key <= 90:
+        mod = 3 # shift
+        key += 32
+    elif key == 62: # shift+G
+        key = 60
+        mod = 3
+    elif key == 16: # ctrl+P
+        key = 112
+        mod = 192
+    elif key == 63: # shift+,
+        mod=3
+        key=44
+
+    event = tcod.event.KeyDown(scancode=0,sym=key,mod=mod)
+    event.type = "KEYDOWN"
+
+    # if key == curses.KEY_RESIZE or key == curses.KEY_MAX:
+    #     event = tcod.event.WindowEvent()
 
-            yield event
-        
\ No newline at end of file
+    return event
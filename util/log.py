@@ -0,0 +1,75 @@
+"""Technical and game logs.
+
+`setup` installs the handlers once for the whole process : loggers only put records in a queue, a
+`QueueListener` thread formats them and writes the files.
+Each subsystem logs to its own child of `tech_logger`, with a debug switch in `debug`. Hot code checks the switch
+before building a message, so a disabled debug log costs one attribute lookup :
+
+    if log.debug.combat:
+        combat_logger.debug("Att:%s success on %s", attack_success, attack)
+"""
+from __future__ import annotations
+
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from typing import Iterable, Optional
+
+TECH_LOGGER = "tech_logger"
+GAME_LOGGER = "game_logger"
+
+ENGINE = "engine"
+AI = "ai"
+COMBAT = "combat"
+WORLD = "world"
+SUBSYSTEMS = (ENGINE, AI, COMBAT, WORLD)
+
+
+class DebugFlags:
+    """Debug switch of each subsystem, see `set_debug`"""
+    engine = False
+    ai = False
+    combat = False
+    world = False
+
+
+debug = DebugFlags()
+_listener: Optional[QueueListener] = None
+
+
+def get(subsystem: str) -> logging.Logger:
+    """Logger of a subsystem"""
+    return logging.getLogger(f"{TECH_LOGGER}.{subsystem}")
+
+
+def set_debug(subsystem: str, enabled: bool) -> None:
+    setattr(debug, subsystem, enabled)
+    get(subsystem).setLevel(logging.DEBUG if enabled else logging.INFO)
+
+
+def setup(debug_subsystems: Iterable[str] = (), tech_file: str = "logfile.log", game_file: str = "game.log") -> None:
+    """Install the log handlers, only the first time. `debug_subsystems` get their debug messages logged."""
+    global _listener
+    debug_subsystems = set(debug_subsystems)
+    for subsystem in SUBSYSTEMS:
+        set_debug(subsystem, subsystem in debug_subsystems)
+    if _listener:
+        return
+
+    tech_handler = logging.FileHandler(filename=tech_file, mode="w")
+    tech_handler.setFormatter(logging.Formatter(fmt="%(levelname)s %(asctime)s %(name)s - %(message)s"))
+    tech_handler.addFilter(logging.Filter(TECH_LOGGER))
+    game_handler = logging.FileHandler(filename=game_file, mode="w")
+    game_handler.addFilter(logging.Filter(GAME_LOGGER))
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    for name in (TECH_LOGGER, GAME_LOGGER):
+        logger = logging.getLogger(name)
+        logger.addHandler(QueueHandler(records))
+        logger.setLevel(logging.INFO) # debug messages only come from the subsystems
+        logger.propagate = False
+
+    _listener = QueueListener(records, tech_handler, game_handler)
+    _listener.start()
+    atexit.register(_listener.stop) # writes the records still queued
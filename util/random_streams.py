@@ -0,0 +1,36 @@
+"""Random streams of a game.
+
+Each stream has its own seed, derived from the world seed and the stream name : drawing from one stream
+(e.g. generating a floor) does not change the others (e.g. combat rolls), and a game can be replayed from its seed.
+"""
+from __future__ import annotations
+
+import random
+import zlib
+from typing import Dict
+
+COMBAT = "combat"
+AI = "ai"
+HAZARDS = "hazards"
+
+
+class RandomStreams:
+    def __init__(self, world_seed: int = -1):
+        if world_seed == -1:
+            world_seed = random.SystemRandom().getrandbits(32)
+        self.world_seed = world_seed
+        self.streams: Dict[str, random.Random] = {}
+
+    def seed_of(self, name: str) -> int:
+        return (self.world_seed << 32) | zlib.crc32(name.encode())
+
+    def get(self, name: str) -> random.Random:
+        """The `random.Random` stream named `name`"""
+        if name not in self.streams:
+            self.streams[name] = random.Random(self.seed_of(name))
+        return self.streams[name]
+
+    def floor(self, branch: str, depth: int) -> random.Random:
+        """A new stream for the generation of a floor : always the same floor, whenever it is generated.
+        Not kept, so that floors can be generated in parallel."""
+        return random.Random(self.seed_of(f"floor:{branch}:{depth}"))
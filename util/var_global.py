@@ -3,7 +3,15 @@
 global xterm
 global seed_init
 global instant_travel
+global autosave_turns
+global save_codec
+global input_batch
+global start_branch
 
 xterm = None
 seed_init = -1
 instant_travel = True
+autosave_turns = 0 # see save_file.Autosave
+save_codec = "zlib-6" # see save_file.CODECS
+input_batch = 0 # see input_buffer.InputBuffer
+start_branch = "main" # see procgen.generators